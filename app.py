@@ -1,33 +1,34 @@
+import os
+import threading
 import streamlit as st
 import traceback
 from datetime import datetime
 
 from utils.io import load_examples
-from utils.processing import get_transition_from_gpt
+from utils.article_format import parse_transitions
+from utils.processing import (
+    generate_article_transitions, fill_missing_transitions, repair_transitions, PAYLOAD_MODE, STREAMING
+)
+from utils.resilience import CircuitOpenError, PartialResultError
 from utils.layout import rebuild_article_with_transitions
-from utils.display import layout_title_and_input, show_output, show_version
+from utils.display import layout_title_and_input, show_output, show_partial_article, show_version
 from utils.version import compute_version_hash
 from utils.title_blurb import generate_title_and_blurb
 from utils.logger import save_output_to_file, logger
+from utils.upload_queue import pending_count, start_worker as start_upload_worker
 from utils.validate_prompt_compliance import validate_batch, display_validation_results
-from utils.google_drive import get_google_drive_service, list_folder_contents, process_drive_files
+from utils.google_drive import get_google_drive_service, list_folder_contents
+from utils.debug_log import debug_toggle, show_debug_panel, record as debug_record
+from utils.tracing import stage_stats, trace, trace_breakdown, write_prometheus
+from utils.repetition_stats import record_article, top_openers, article_count
+from utils.drive_mirror import sync_files, iter_mirrored_transitions, prune as prune_mirror
 
 def process_uploaded_files(uploaded_files):
     results = []
     for uploaded_file in uploaded_files:
         try:
-            content = uploaded_file.getvalue().decode('utf-8')
-            lines = content.strip().split('\n')
-            transitions = []
-
-            for line in lines:
-                line = line.strip()
-                if line.startswith("Transitions générées:"):
-                    continue
-                if line and line[0].isdigit() and ". " in line:
-                    transition = line.split(". ", 1)[1].strip()
-                    transitions.append(transition)
-
+            # Parsed line by line straight from the uploaded bytes
+            transitions = parse_transitions(uploaded_file)
             if transitions:
                 results.append((uploaded_file.name, transitions))
 
@@ -37,7 +38,111 @@ def process_uploaded_files(uploaded_files):
 
     return results
 
+def run_generation(text_input, result_tab, force_fresh, batch_mode, auto_repair, streaming, pending=None):
+    """
+    Generate, repair and rebuild the article, storing the result in the session.
+    With pending (transitions kept from a partly failed run), only the missing
+    transitions are generated.
+    """
+    if "TRANSITION" not in text_input:
+        st.warning("Aucune balise `TRANSITION` trouvée.")
+        return
+    # Transitions show up in the Résultat tab as they are generated
+    live_result = result_tab.empty()
+    try:
+        # One trace per article: every stage below is timed under its id
+        with trace("article") as trace_id:
+            examples = load_examples()
+            logger.info("Successfully loaded examples")
+            debug_record("examples_preview", examples=examples[:3])
+
+            parts = text_input.split("TRANSITION")
+            pairs = list(zip(parts[:-1], parts[1:]))
+            logger.info(f"Processing {len(pairs)} paragraph pairs")
+
+            # Safely extract title and chapo from dict
+            #title_blurb = generate_title_and_blurb(parts[0])
+            #if isinstance(title_blurb, dict):
+                #title = title_blurb.get("title", "Titre non défini")
+                #chapo = title_blurb.get("chapo", "Chapeau non défini")
+            #else:
+                #title = "Titre non défini"
+                #chapo = "Chapeau non défini"
+
+            #logger.info("Generated title and blurb")
+            title = "Titre désactivé"
+            chapo = "Chapeau désactivé"
+            partial = [t or "" for t in pending] if pending else [""] * len(pairs)
+            partial_lock = threading.Lock()
+
+            def show_partial(index, text):
+                with partial_lock:
+                    if partial[index] != text:
+                        partial[index] = text
+                        show_partial_article(live_result, parts, partial)
+
+            if pending:
+                generated_transitions = fill_missing_transitions(
+                    parts, pending, examples, use_cache=not force_fresh,
+                    stream=streaming, on_partial=show_partial
+                )
+            else:
+                generated_transitions = generate_article_transitions(
+                    parts, examples, batch=batch_mode, use_cache=not force_fresh,
+                    stream=streaming, on_partial=show_partial
+                )
+            st.session_state.pop('partial_transitions', None)
+            logger.info(f"Generated {len(generated_transitions)}/{len(pairs)} transitions")
+            if auto_repair:
+                generated_transitions, remaining = repair_transitions(
+                    parts, generated_transitions, examples, use_cache=not force_fresh
+                )
+                if remaining:
+                    logger.warning(f"Violations left after repair: {remaining}")
+
+            rebuilt_text, error = rebuild_article_with_transitions(text_input, generated_transitions)
+            if error:
+                logger.error(f"Error rebuilding article: {error}")
+                st.error(error)
+                return
+
+            st.session_state['title_text'] = title
+            st.session_state['chapo_text'] = chapo
+            st.session_state['rebuilt_text'] = rebuilt_text
+            st.session_state['generated_transitions'] = generated_transitions
+            # A new article: the Sauvegarde tab saves it on its next render
+            st.session_state.pop('saved_path', None)
+
+            st.write("🔍 Titre:", title)
+            st.write("🔍 Chapo:", chapo)
+        logger.info(f"Article {trace_id} timings: {trace_breakdown(trace_id)}")
+        write_prometheus()
+
+    except PartialResultError as e:
+        # Keep the transitions that did succeed so only the missing ones are retried
+        st.session_state['partial_transitions'] = e.partial
+        st.session_state['partial_input'] = text_input
+        logger.warning(str(e))
+    except CircuitOpenError as e:
+        st.error(f"🚨 Le service de génération est momentanément indisponible : {e}")
+        logger.warning(str(e))
+    except Exception:
+        st.error("🚨 Une erreur est survenue lors de la génération.")
+        st.code(traceback.format_exc(), language="python")
+        logger.error(traceback.format_exc())
+    finally:
+        live_result.empty()
+
+def pending_transitions(text_input):
+    """Transitions kept from a partly failed generation of this same text, if any."""
+    if st.session_state.get('partial_input') == text_input:
+        return st.session_state.get('partial_transitions')
+    return None
+
 def main():
+    # Resume uploads left pending by a previous run
+    start_upload_worker()
+
     VERSION = compute_version_hash([
         "app.py",
         "transitions.json",
@@ -60,59 +165,48 @@ def main():
 
     with tab1:
         text_input = layout_title_and_input()
+        force_fresh = st.checkbox("🔄 Ignorer le cache (nouvelle génération)", value=False)
+        batch_mode = st.checkbox("📦 Générer toutes les transitions en une seule requête", value=True)
+        auto_repair = st.checkbox("🛠️ Corriger automatiquement les transitions non conformes", value=True)
+        # The proxy only streams replies to chat payloads
+        streaming_available = PAYLOAD_MODE == "chat"
+        streaming = st.checkbox(
+            "⚡ Afficher les transitions au fil de la génération (streaming)",
+            value=STREAMING and streaming_available,
+            disabled=not streaming_available,
+            help=None if streaming_available else (
+                "Le streaming nécessite API_PAYLOAD_MODE = \"chat\" ; "
+                "en mode \"prompt\", les transitions s'affichent une fois générées."
+            )
+        )
+        debug_toggle()
 
         if st.button("✨ Générer les transitions"):
-            if "TRANSITION" not in text_input:
-                st.warning("Aucune balise `TRANSITION` trouvée.")
-                return
-            try:
-                examples = load_examples()
-                logger.info("Successfully loaded examples")
-                st.write("🔍 Examples preview (first 3):", examples[:3])
-
-                parts = text_input.split("TRANSITION")
-                pairs = list(zip(parts[:-1], parts[1:]))
-                logger.info(f"Processing {len(pairs)} paragraph pairs")
-
-                # Safely extract title and chapo from dict
-                #title_blurb = generate_title_and_blurb(parts[0])
-                #if isinstance(title_blurb, dict):
-                    #title = title_blurb.get("title", "Titre non défini")
-                    #chapo = title_blurb.get("chapo", "Chapeau non défini")
-                #else:
-                    #title = "Titre non défini"
-                    #chapo = "Chapeau non défini"
-
-                #logger.info("Generated title and blurb")
-                title = "Titre désactivé"
-                chapo = "Chapeau désactivé"
-                generated_transitions = []
-                for i, (para_a, para_b) in enumerate(pairs, 1):
-                    transition = get_transition_from_gpt(para_a, para_b, examples)
-                    generated_transitions.append(transition)
-                    logger.info(f"Generated transition {i}/{len(pairs)}")
-
-                rebuilt_text, error = rebuild_article_with_transitions(text_input, generated_transitions)
-                if error:
-                    logger.error(f"Error rebuilding article: {error}")
-                    st.error(error)
-                    return
-
-                st.session_state['title_text'] = title
-                st.session_state['chapo_text'] = chapo
-                st.session_state['rebuilt_text'] = rebuilt_text
-                st.session_state['generated_transitions'] = generated_transitions
-
-                st.write("🔍 Titre:", title)
-                st.write("🔍 Chapo:", chapo)
-
-            except Exception:
-                st.error("🚨 Une erreur est survenue lors de la génération.")
-                st.code(traceback.format_exc(), language="python")
-                logger.error(traceback.format_exc())
+            run_generation(text_input, tab2, force_fresh, batch_mode, auto_repair, streaming)
+
+        pending = pending_transitions(text_input)
+        if pending:
+            st.warning(
+                f"⚠️ {sum(t is None for t in pending)} transition(s) sur {len(pending)} n'ont pas pu être "
+                "générées malgré plusieurs essais. Les autres sont conservées."
+            )
+            if st.button("🔁 Compléter les transitions manquantes"):
+                run_generation(text_input, tab2, force_fresh, batch_mode, auto_repair, streaming, pending)
+
+        stats = stage_stats()
+        if stats:
+            with st.expander("⏱️ Temps par étape (depuis le démarrage)"):
+                st.table([
+                    {"Étape": stage, "Appels": summary["count"], "Erreurs": summary["errors"],
+                     "p50 (ms)": summary["p50_ms"], "p95 (ms)": summary["p95_ms"]}
+                    for stage, summary in stats.items()
+                ])
 
     with tab2:
-        if 'rebuilt_text' in st.session_state:
+        pending = pending_transitions(text_input)
+        if pending:
+            show_partial_article(st.empty(), text_input.split("TRANSITION"), pending)
+        elif 'rebuilt_text' in st.session_state:
             show_output(
                 st.session_state['title_text'],
                 st.session_state['chapo_text'],
@@ -127,24 +221,41 @@ def main():
             logger.info(f"Validation results: {validation_results}")
             display_validation_results(validation_results)
 
+        with st.expander("📊 Ouvertures les plus fréquentes cette semaine"):
+            openers = top_openers(days=7)
+            if openers:
+                st.caption(f"Sur {article_count(days=7)} articles sauvegardés")
+                st.table([{"Ouverture": term, "Occurrences": count} for term, count in openers])
+            else:
+                st.info("Aucun article sauvegardé cette semaine.")
+
     with tab4:
         if 'rebuilt_text' in st.session_state:
-            filepath = save_output_to_file(
-                st.session_state['title_text'],
-                st.session_state['chapo_text'],
-                st.session_state['rebuilt_text'],
-                st.session_state['generated_transitions']
-            )
+            # Save and record each generated article once, not on every rerun
+            if 'saved_path' not in st.session_state:
+                filepath = save_output_to_file(
+                    st.session_state['title_text'],
+                    st.session_state['chapo_text'],
+                    st.session_state['rebuilt_text'],
+                    st.session_state['generated_transitions']
+                )
+                if filepath:
+                    st.session_state['saved_path'] = filepath
+                    logger.info(f"Saved article to {filepath} and queued it for upload")
+                    record_article(os.path.basename(filepath), st.session_state['generated_transitions'])
+            filepath = st.session_state.get('saved_path')
             if filepath:
-                st.success(f"✅ L'article a été sauvegardé dans `{filepath}` et uploadé sur GoogleDrive")
-                logger.info(f"Saved and uploaded article to {filepath}")
+                st.success(f"✅ L'article a été sauvegardé dans `{filepath}` et sera uploadé sur GoogleDrive en arrière-plan")
+                pending_uploads = pending_count()
+                if pending_uploads:
+                    st.caption(f"⏳ {pending_uploads} fichier(s) en attente d'upload sur Google Drive")
                 st.markdown("### 📁 Accès aux fichiers")
                 st.markdown(f"""
                 [Ouvrir le dossier Google Drive](https://drive.google.com/drive/folders/{st.secrets.get("gdrive_folder_id")})
                 """)
             else:
-                st.warning("⚠️ L'article a été sauvegardé localement mais l'upload a échoué")
-                logger.warning("Article saved locally but GoogleDrive upload failed")
+                st.error("🚨 L'article n'a pas pu être sauvegardé.")
+                logger.warning("Article could not be saved")
 
     with tab5:
         st.markdown("### 📄 Upload par lot depuis Google Drive")
@@ -160,6 +271,7 @@ def main():
             drive_service = get_google_drive_service()
             folder_id = st.secrets.get("gdrive_folder_id")
             files = list_folder_contents(drive_service, folder_id)
+            prune_mirror(files)
 
             if files:
                 selected_files = []
@@ -173,9 +285,10 @@ def main():
                 if st.button("Select All files"):
                     selected_files = files
                 if selected_files:
-                    batch_results = process_drive_files(drive_service, selected_files)
-                    if batch_results:
-                        validation_results = validate_batch(batch_results)
+                    # Only new or changed files are downloaded into the local mirror
+                    sync_files(selected_files)
+                    validation_results = validate_batch(iter_mirrored_transitions(selected_files))
+                    if validation_results['total_outputs']:
                         display_validation_results(validation_results)
                     else:
                         st.warning("⚠️ Aucune transition n'a pu être extraite des fichiers sélectionnés.")
@@ -191,6 +304,7 @@ def main():
         [Ouvrir le dossier](https://drive.google.com/drive/folders/{st.secrets.get("gdrive_folder_id")})
         """)
 
+    show_debug_panel()
     show_version(VERSION)
 
 if __name__ == "__main__":
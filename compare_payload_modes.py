@@ -0,0 +1,76 @@
+import argparse
+import random
+import sys
+from typing import Dict, List
+
+from utils import processing, tracing
+from utils.io import load_examples
+from utils.mock_proxy import start as start_mock_proxy
+
+MODES = ("prompt", "chat")
+
+def build_articles(examples, count: int, paragraphs: int, seed: int = 0) -> List[List[str]]:
+    """Synthetic articles made of example paragraphs, split into parts like the app does."""
+    rng = random.Random(seed)
+    articles = []
+    for _ in range(count):
+        picks = [examples[i] for i in rng.sample(range(len(examples)), paragraphs)]
+        articles.append([ex["paragraph_a"] for ex in picks])
+    return articles
+
+def run_mode(mode: str, articles: List[List[str]], examples, batch: bool) -> Dict:
+    """Generate every article with one payload mode and summarize its spans."""
+    processing.PAYLOAD_MODE = mode
+    records = []
+    for parts in articles:
+        with tracing.trace("compare_article") as trace_id:
+            processing.generate_article_transitions(parts, examples, batch=batch, use_cache=False)
+        records.extend(tracing.trace_records(trace_id))
+
+    stages = tracing.aggregate(records)
+    requests = stages["llm_request"].summary()
+    article = stages["compare_article"].summary()
+    return {
+        "mode": mode,
+        "requests": requests["count"],
+        "request_p50_ms": requests["p50_ms"],
+        "request_p95_ms": requests["p95_ms"],
+        "article_p50_ms": article["p50_ms"],
+        "article_p95_ms": article["p95_ms"],
+        "prompt_chars": requests.get("prompt_chars", 0),
+        "prompt_tokens": requests.get("prompt_tokens", 0),
+        "cached_tokens": requests.get("cached_tokens", 0),
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare latency and prompt tokens of the 'prompt' and 'chat' proxy payload modes."
+    )
+    parser.add_argument("--articles", type=int, default=20, help="Number of synthetic articles (default: 20)")
+    parser.add_argument("--paragraphs", type=int, default=5, help="Paragraphs per article (default: 5)")
+    parser.add_argument("--batch", action="store_true", help="One request per article instead of one per transition")
+    parser.add_argument("--url", help="Proxy to benchmark instead of the local mock proxy (API_URL)")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        processing.API_URL = args.url
+    else:
+        mock, processing.API_URL = start_mock_proxy()
+
+    examples = load_examples()
+    articles = build_articles(examples, args.articles, args.paragraphs)
+    results = [run_mode(mode, articles, examples, args.batch) for mode in MODES]
+
+    columns = list(results[0])
+    print("".join(f"{column:>16}" for column in columns))
+    for result in results:
+        print("".join(f"{result[column]:>16}" for column in columns))
+
+    legacy, chat = results
+    if legacy["prompt_tokens"]:
+        saved = 1 - chat["prompt_tokens"] / legacy["prompt_tokens"]
+        print(f"\nchat mode sends {saved:.1%} fewer prompt tokens", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
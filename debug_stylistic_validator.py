@@ -1,7 +1,8 @@
 import os
 from collections import Counter
 from utils.io import load_all_transitions
-from utils.validate_prompt_compliance import tokenize, extract_ngrams, load_stylistic_expressions
+from utils.extract_patterns import count_shard
+from utils.validate_prompt_compliance import load_stylistic_expressions
 
 TRANSITIONS_FILE = 'transitions.json'
 STYLISTIC_FILE = 'stylistic_patterns.txt'
@@ -48,18 +49,12 @@ def run_full_debug():
 
     # Step 3: N-gram analysis
     report.append("\n🧮 Analyzing common bigrams and trigrams...")
-    all_ngrams = []
-    for group in data:
-        for phrase in group:
-            all_ngrams.extend(extract_ngrams(tokenize(phrase), 2))
-            all_ngrams.extend(extract_ngrams(tokenize(phrase), 3))
-
-    ngram_counts = Counter(all_ngrams)
-    common_ngrams = [(ng, c) for ng, c in ngram_counts.items() if c >= 3]
+    ngram_counts, _ = count_shard(data, (2, 3))
+    common_ngrams = [(ng, c) for (_, ng), c in ngram_counts.items() if c >= 3]
     if common_ngrams:
         report.append("🔢 Frequent stylistic n-grams (count ≥ 3):")
         for ngram, count in sorted(common_ngrams, key=lambda x: -x[1])[:20]:
-            report.append(f"  {' '.join(ngram)} ({count} times)")
+            report.append(f"  {ngram} ({count} times)")
     else:
         report.append("✅ No repeated n-grams found above threshold.")
 
@@ -0,0 +1,186 @@
+# Frozen copy of check_transition_group and its helpers as they were before the
+# single-pass rewrite, kept as the oracle for tests/test_check_transition_group.py.
+# Do not edit. Only the stopwords path differs (this file lives in tests/) and the
+# Streamlit display, validate_batch and the debug print are left out.
+from typing import List, Dict, Set
+import string
+from collections import Counter
+import os
+import re
+
+def load_stopwords() -> Set[str]:
+    stopwords_file = os.path.join(os.path.dirname(__file__), '..', 'utils', 'french_stopwords.txt')
+    with open(stopwords_file, 'r', encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+# Load French stopwords
+FRENCH_STOPWORDS: Set[str] = load_stopwords()
+
+def load_stylistic_expressions(filepath: str = 'stylistic_patterns.txt') -> Set[str]:
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return {line.strip().lower() for line in f if line.strip()}
+
+# Load stylistic patterns from file
+STYLISTIC_EXPRESSIONS: Set[str] = load_stylistic_expressions()
+
+def tokenize(text: str) -> List[str]:
+    """
+    Normalizes case, removes punctuation, and returns word tokens.
+    
+    Args:
+        text (str): The input transition phrase 
+        
+    Returns:
+        List[str]: List of lowercase words, stripped of punctuation
+    """
+    # Replace apostrophes with spaces to split words properly
+    text = text.replace("'", " ")
+    
+    # Remove punctuation and convert to lowercase
+    translator = str.maketrans('', '', string.punctuation)
+    cleaned_text = text.translate(translator).lower()
+    
+    # Split into words and filter out empty strings
+    words = [word.strip() for word in cleaned_text.split()]
+    return [word for word in words if word]
+
+def extract_ngrams(words: List[str], n: int) -> List[str]:
+    """
+    Extract n-grams from a list of words.
+    
+    Args:
+        words (List[str]): List of words
+        n (int): Size of n-gram
+        
+    Returns:
+        List[str]: List of n-grams
+    """
+    return [' '.join(words[i:i+n]) for i in range(len(words)-n+1)]
+
+def check_stylistic_patterns(transitions: List[str]) -> List[str]:
+    """
+    Check for repetitive stylistic patterns in transitions.
+    
+    Args:
+        transitions (List[str]): List of transition phrases
+        
+    Returns:
+        List[str]: List of violated patterns
+    """
+    violations = []
+    
+    # Extract bigrams and trigrams from all transitions
+    all_ngrams = []
+    for transition in transitions:
+        words = tokenize(transition)
+        all_ngrams.extend(extract_ngrams(words, 2))  # bigrams
+        all_ngrams.extend(extract_ngrams(words, 3))  # trigrams
+    
+    # Check for repeated stylistic expressions
+    ngram_counts = Counter(all_ngrams)
+    for expr in STYLISTIC_EXPRESSIONS:
+        if ngram_counts[expr] > 1:
+            violations.append(expr)
+    
+    return violations
+
+def check_flexible_patterns(transitions: List[str]) -> List[str]:
+    """
+    Check for flexible pattern matches using regex.
+    
+    Args:
+        transitions (List[str]): List of transition phrases
+        
+    Returns:
+        List[str]: List of violated patterns
+    """
+    violations = []
+    
+    # Define flexible patterns
+    patterns = [
+        r'(sur|dans|par) un autre \w+',
+        r'(sur|dans|par) la même \w+',
+        r'(sur|dans|par) le même \w+',
+        r'dans l\'actualité \w+',
+        r'pour (terminer|conclure|finir)',
+        r'(signalons|sachez|nous) \w+'
+    ]
+    
+    # Check each transition against patterns
+    for pattern in patterns:
+        matches = []
+        for transition in transitions:
+            if re.search(pattern, transition.lower()):
+                matches.append(transition)
+        if len(matches) > 1:
+            violations.append(pattern)
+    
+    return violations
+
+def check_transition_group(transitions: List[str]) -> Dict:
+    """
+    Validates a group of transitions for repetition and 'enfin' placement.
+    
+    Args:
+        transitions (List[str]): List of transition phrases
+        
+    Returns:
+        Dict: Dictionary containing violation information
+    """
+    violations = {}
+    
+    # Check for word repetition at the beginning of phrases (including stopwords)
+    first_words = []
+    for transition in transitions:
+        words = tokenize(transition)
+        if words:  # If there are any words
+            first_words.append(words[0])  # Get the first word
+    
+    # Find repeated first words
+    first_word_counts = Counter(first_words)
+    repeated_first_words = [word for word, count in first_word_counts.items() if count > 1]
+    if repeated_first_words:
+        violations["repetition"] = repeated_first_words
+    
+    # Check for content-bearing word repetition in mid-sentence (excluding stopwords)
+    all_content_words = []
+    for transition in transitions:
+        words = tokenize(transition)
+        if len(words) > 1:  # Only check mid-sentence words
+            # Filter out stopwords and empty strings
+            meaningful_words = [w for w in words[1:] if w and w not in FRENCH_STOPWORDS]
+            all_content_words.extend(meaningful_words)
+    
+    # Find repeated content-bearing words
+    content_word_counts = Counter(all_content_words)
+    repeated_content_words = [word for word, count in content_word_counts.items() if count > 1]
+    if repeated_content_words:
+        if "repetition" in violations:
+            violations["repetition"].extend(repeated_content_words)
+        else:
+            violations["repetition"] = repeated_content_words
+    
+    # Check for stylistic pattern repetition
+    stylistic_violations = check_stylistic_patterns(transitions)
+    if stylistic_violations:
+        if "repetition" in violations:
+            violations["repetition"].extend(stylistic_violations)
+        else:
+            violations["repetition"] = stylistic_violations
+    
+    # Check for flexible pattern matches
+    flexible_violations = check_flexible_patterns(transitions)
+    if flexible_violations:
+        if "repetition" in violations:
+            violations["repetition"].extend(flexible_violations)
+        else:
+            violations["repetition"] = flexible_violations
+    
+    # Check 'enfin' placement
+    for i, transition in enumerate(transitions):
+        words = tokenize(transition)
+        if "enfin" in words and i != len(transitions) - 1:
+            violations["enfin_misplaced"] = True
+            break
+    
+    return violations
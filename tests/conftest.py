@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+from streamlit import config
+
+# The validators load stylistic_patterns.txt and transitions.json from the
+# working directory, as the app does when started from the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+
+# utils.processing needs API_TOKEN and API_URL at import; tests point API_URL
+# at a utils.mock_proxy server instead of the real proxy. The response cache
+# goes to a temporary directory and spans are not written to logs/.
+_TMP_DIR = tempfile.mkdtemp(prefix="transitions-tests-")
+_SECRETS_PATH = os.path.join(_TMP_DIR, "secrets.toml")
+with open(_SECRETS_PATH, 'w', encoding='utf-8') as f:
+    f.write(
+        'API_TOKEN = "test-token"\n'
+        'API_URL = "http://127.0.0.1:9/"\n'
+        f'RESPONSE_CACHE_PATH = "{os.path.join(_TMP_DIR, "responses.sqlite")}"\n'
+        'TRACE_TO_FILE = false\n'
+    )
+config.set_option("secrets.files", [_SECRETS_PATH])
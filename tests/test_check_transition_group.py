@@ -0,0 +1,105 @@
+"""
+check_transition_group must give the same output as the baseline validator
+frozen in baseline_validate_prompt_compliance.py.
+
+The baseline only matched stylistic expressions against bigrams and trigrams
+of the tokens, so expressions with punctuation or more than three words never
+matched; the pattern matcher finds those on purpose. The equivalence tests
+therefore give both validators the same set of expressions the baseline can
+match, and the last test pins down that intended difference.
+"""
+import json
+import random
+
+import pytest
+
+import baseline_validate_prompt_compliance as baseline
+from utils import validate_prompt_compliance as validator
+from utils.pattern_matcher import PatternMatcher
+
+SEED = 0
+SAMPLES = 3000
+
+EXPRESSIONS = [
+    "par ailleurs", "dans un autre", "un autre registre", "on apprend", "sachez que",
+    "nous apprenons", "apprenons que", "du côté", "côté de", "pour terminer", "en effet",
+    "à noter", "il faut", "la même", "dans le"
+]
+
+GOLDEN = [
+    ([], {}),
+    ([""], {}),
+    (["Par ailleurs,", "Par contre,", "Par exemple,"], {"repetition": ["par"]}),
+    (
+        ["Prenons la direction de Paris,", "Ensuite, prenons la direction de Lyon,", "Enfin, une note sur Marseille"],
+        {"repetition": ["direction"]}
+    ),
+    (
+        ["Enfin, une annonce importante", "Puis une autre nouvelle", "Pour conclure,"],
+        {"enfin_misplaced": True}
+    ),
+    (["Par ailleurs,", "Par ailleurs,"], {"repetition": ["par", "ailleurs", "par ailleurs"]}),
+    (
+        ["Sachez que la fête", "Sachez que la fête"],
+        {"repetition": ["sachez", "fête", "sachez que", r"(signalons|sachez|nous) \w+"]}
+    ),
+    (["Enfin,", "Enfin,"], {"repetition": ["enfin"], "enfin_misplaced": True}),
+]
+
+@pytest.fixture
+def expressions(monkeypatch):
+    """Run both validators with the same bigram and trigram expressions."""
+    expressions = set(EXPRESSIONS)
+    monkeypatch.setattr(baseline, "STYLISTIC_EXPRESSIONS", expressions)
+    monkeypatch.setattr(validator, "STYLISTIC_EXPRESSIONS", expressions)
+    monkeypatch.setattr(validator, "STYLISTIC_MATCHER", PatternMatcher(expressions, validator.tokenize))
+    monkeypatch.setattr(validator, "_STYLISTIC_ORDER", {expr: i for i, expr in enumerate(expressions)})
+    return expressions
+
+def _mutate(rng, transition):
+    """Vary case, punctuation and apostrophes the way model replies do."""
+    choice = rng.randrange(5)
+    if choice == 0:
+        return transition.upper()
+    if choice == 1:
+        return transition.replace(" ", " ' ", 1)
+    if choice == 2:
+        return f"{transition} !"
+    if choice == 3:
+        return f"Enfin, {transition.lower()}"
+    return transition
+
+def _random_groups():
+    with open("transitions.json", 'r', encoding='utf-8') as f:
+        bank = [ex["transition"] for ex in json.load(f)]
+    bank += EXPRESSIONS + ["Nous apprenons que", "Dans la même veine,", "Pour finir,", "...", "  "]
+    rng = random.Random(SEED)
+    groups = []
+    for _ in range(SAMPLES):
+        group = rng.sample(bank, rng.randint(1, 12))
+        # Repeat some transitions so that every kind of violation shows up
+        group += [_mutate(rng, t) for t in rng.sample(group, rng.randint(0, len(group)))]
+        rng.shuffle(group)
+        groups.append(group)
+    return groups
+
+@pytest.mark.parametrize("transitions,expected", GOLDEN)
+def test_golden_outputs(expressions, transitions, expected):
+    assert baseline.check_transition_group(transitions) == expected
+    assert validator.check_transition_group(transitions) == expected
+
+def test_tokenize_matches_baseline():
+    for text in ["L'actualité, ici !", "  Dans   un autre registre…", "Aujourd'hui: « Enfin »", ""]:
+        assert validator.tokenize(text) == baseline.tokenize(text)
+
+def test_random_groups_match_baseline(expressions):
+    mismatches = [
+        group for group in _random_groups()
+        if validator.check_transition_group(group) != baseline.check_transition_group(group)
+    ]
+    assert not mismatches, mismatches[:5]
+
+def test_long_expressions_are_now_matched():
+    group = ["Dans un tout autre registre,", "Dans un tout autre registre, ici"]
+    assert "dans un tout autre registre," not in baseline.check_transition_group(group).get("repetition", [])
+    assert "dans un tout autre registre," in validator.check_transition_group(group)["repetition"]
@@ -0,0 +1,61 @@
+"""
+Requests sent by utils.processing, checked against utils.mock_proxy: the
+chat payload mode sends the messages as native JSON, the prompt mode wraps
+them in one string, and a streamed reply stops once the transition is complete.
+"""
+import ast
+
+import pytest
+
+from utils import mock_proxy, processing
+
+EXAMPLES = [{
+    "paragraph_a": "Le marché de Noël ouvre samedi.",
+    "transition": "Côté sport,",
+    "paragraph_b": "le club local a gagné dimanche."
+}]
+
+@pytest.fixture
+def proxy(monkeypatch):
+    server, url = mock_proxy.start(base_latency=0, latency_per_1k_tokens=0, latency_per_output_token=0.01)
+    monkeypatch.setattr(processing, "API_URL", url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _pair_message(messages):
+    return messages[-1]["content"]
+
+def test_chat_mode_sends_messages_natively(proxy, monkeypatch):
+    monkeypatch.setattr(processing, "PAYLOAD_MODE", "chat")
+    processing.get_transition_from_gpt("Premier paragraphe.", "Second paragraphe.", EXAMPLES, use_cache=False)
+
+    body = proxy.requests[-1]
+    assert "prompt" not in body
+    assert body["model"] == "gpt-4"
+    assert body["messages"][0] == {"role": "system", "content": processing.SYSTEM_PROMPT}
+    assert _pair_message(body["messages"]) == "Premier paragraphe.\nTRANSITION\nSecond paragraphe."
+
+def test_prompt_mode_sends_one_prompt_string(proxy, monkeypatch):
+    monkeypatch.setattr(processing, "PAYLOAD_MODE", "prompt")
+    processing.get_transition_from_gpt("Premier paragraphe.", "Second paragraphe.", EXAMPLES, use_cache=False)
+
+    body = proxy.requests[-1]
+    assert set(body) == {"prompt"}
+    payload = ast.literal_eval(body["prompt"])
+    assert payload["model"] == "gpt-4"
+    assert _pair_message(payload["messages"]) == "Premier paragraphe.\nTRANSITION\nSecond paragraphe."
+
+def test_stream_stops_once_transition_is_complete(proxy, monkeypatch):
+    monkeypatch.setattr(processing, "PAYLOAD_MODE", "chat")
+    partials = []
+    reply = processing.get_transition_from_gpt(
+        "Premier paragraphe.", "Second paragraphe.", EXAMPLES, use_cache=False,
+        stream=True, on_text=partials.append
+    )
+
+    assert proxy.requests[-1]["stream"] is True
+    # The mock replies "Par ailleurs, on note que la situation évolue toujours."
+    assert reply == "Par ailleurs, on note que"
+    # Stopped on the sixth word, the first one past the 5-word limit
+    assert len(partials) == processing.MAX_TRANSITION_WORDS + 1
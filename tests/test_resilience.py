@@ -0,0 +1,114 @@
+"""
+Circuit breaker and retry budget of utils.resilience, with the HTTP session
+stubbed: a trial request after the reset delay closes the circuit when it
+succeeds and reopens it when it fails, whatever the error.
+"""
+import time
+
+import pytest
+import requests
+
+from utils import processing, resilience, tracing
+
+class FakeResponse:
+    def __init__(self, status_code=200, headers=None, lines=()):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.lines = lines
+        self.encoding = None
+        self.text = ""
+
+    def iter_lines(self, chunk_size=None, decode_unicode=False):
+        for line in self.lines:
+            if isinstance(line, Exception):
+                raise line
+            yield line
+
+    def close(self):
+        pass
+
+class FakeClient:
+    """Answers each POST with the next outcome: a response or an exception to raise."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def post(self, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = resilience.CircuitBreaker(threshold=2, reset_seconds=0.05)
+    monkeypatch.setattr(resilience, "breaker", breaker)
+    monkeypatch.setattr(processing, "breaker", breaker)
+    monkeypatch.setattr(resilience, "MAX_RETRIES", 1)
+    monkeypatch.setattr(resilience, "BACKOFF_BASE", 0)
+    return breaker
+
+def _use(monkeypatch, client):
+    monkeypatch.setattr(resilience.http_client, "post", client.post)
+    return client
+
+def _open_circuit(monkeypatch, breaker):
+    _use(monkeypatch, FakeClient(requests.ConnectionError("down"), FakeResponse(503)))
+    with pytest.raises(resilience.ProxyError):
+        resilience.post_with_retries("http://proxy/")
+    assert breaker.is_open
+    with pytest.raises(resilience.CircuitOpenError) as e:
+        resilience.post_with_retries("http://proxy/")
+    assert e.value.retry_in > 0
+    time.sleep(breaker.reset_seconds)
+
+def test_successful_trial_closes_circuit(monkeypatch, breaker):
+    _open_circuit(monkeypatch, breaker)
+    _use(monkeypatch, FakeClient(FakeResponse(200)))
+
+    assert resilience.post_with_retries("http://proxy/").status_code == 200
+    assert not breaker.is_open
+    assert breaker.failures == 0
+
+def test_failed_trial_reopens_circuit(monkeypatch, breaker):
+    _open_circuit(monkeypatch, breaker)
+    client = _use(monkeypatch, FakeClient(FakeResponse(502)))
+
+    with pytest.raises(resilience.CircuitOpenError) as e:
+        resilience.post_with_retries("http://proxy/")
+    assert client.calls == 1
+    assert e.value.retry_in > 0
+    assert breaker.is_open
+
+def test_unexpected_trial_error_still_resolves_trial(monkeypatch, breaker):
+    _open_circuit(monkeypatch, breaker)
+    _use(monkeypatch, FakeClient(requests.TooManyRedirects("loop")))
+
+    with pytest.raises(requests.TooManyRedirects):
+        resilience.post_with_retries("http://proxy/")
+    assert breaker.is_open
+    assert not breaker._trial_in_flight
+
+    # The next trial after the reset delay gets through again
+    time.sleep(breaker.reset_seconds)
+    _use(monkeypatch, FakeClient(FakeResponse(200)))
+    assert resilience.post_with_retries("http://proxy/").status_code == 200
+    assert not breaker.is_open
+
+def test_broken_stream_shares_the_retry_budget(monkeypatch, breaker):
+    broken = requests.exceptions.ChunkedEncodingError("cut")
+    stream = {"Content-Type": "text/event-stream"}
+    client = _use(monkeypatch, FakeClient(
+        FakeResponse(200, stream, [broken]),
+        FakeResponse(200, stream, [broken]),
+        FakeResponse(200, stream, [broken]),
+    ))
+
+    with pytest.raises(resilience.ProxyError, match="stream failed"):
+        processing._stream_completion({"prompt": "x"}, tracing.Span("test", {}))
+    # MAX_RETRIES = 1: one attempt plus one retry for the whole request
+    assert client.calls == 2
+    # The broken body counts as a failure even though the headers were fine
+    assert breaker.failures == 1
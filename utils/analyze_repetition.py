@@ -1,27 +1,12 @@
 from typing import List, Dict, Tuple
-import string
 from collections import Counter
-
-def tokenize(text: str) -> List[str]:
-    """
-    Cleans and tokenizes a transition phrase into individual words.
-    Args:
-        text (str): The input transition phrase
-    Returns:
-        List[str]: List of lowercase words, stripped of punctuation
-    """
-    
-    # Remove punctuation and convert to lowercase
-    translator = str.maketrans('', '', string.punctuation)
-    cleaned_text = text.translate(translator).lower()
-    
-    # Split into words and filter out empty strings
-    words = [word.strip() for word in cleaned_text.split()]
-    return [word for word in words if word]
+# Same tokenizer as the validator, so both agree on what a word is
+from utils.validate_prompt_compliance import tokenize
 
 def analyze_transitions_batch(batch_outputs: List[List[str]]) -> Dict:
     """
     Analyzes a batch of transition outputs for word repetition patterns.
+    Statistics across all generated articles are kept in utils.repetition_stats.
     Args:
         batch_outputs (List[List[str]]): List of transition phrase groups
     Returns:
@@ -0,0 +1,110 @@
+import io
+import os
+import re
+from datetime import datetime
+from typing import IO, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+# Layout of the article files written by save_output_to_file:
+#
+#   Titre: <title>
+#
+#   Chapeau: <chapo>
+#
+#   Article:
+#   <article text>
+#
+#   Transitions générées:
+#   1. <transition>
+#   2. <transition>
+TITLE_PREFIX = "Titre:"
+CHAPO_PREFIX = "Chapeau:"
+ARTICLE_HEADER = "Article:"
+TRANSITIONS_HEADER = "Transitions générées:"
+# Files are named article_YYYYMMDD_HHMMSS.txt after their generation time
+FILENAME_TIMESTAMP = re.compile(r"article_(\d{8})_(\d{6})")
+
+class ArticleRecord(NamedTuple):
+    """
+    One parsed element of an article file.
+    section is 'title', 'chapo', 'article' (one record per body line) or
+    'transition'; index is the body line number or the transition number.
+    """
+    section: str
+    index: Optional[int]
+    text: str
+
+def write_article(f: IO[str], title: str, chapo: str, article_text: str, transitions: List[str]) -> None:
+    """Write an article and its transitions in the shared file format."""
+    f.write(f"{TITLE_PREFIX} {title}\n\n")
+    f.write(f"{CHAPO_PREFIX} {chapo}\n\n")
+    f.write(f"{ARTICLE_HEADER}\n")
+    f.write(article_text.strip() + "\n\n")
+    f.write(f"{TRANSITIONS_HEADER}\n")
+    for i, t in enumerate(transitions, 1):
+        f.write(f"{i}. {t}\n")
+
+def _parse_numbered(line: str):
+    number, sep, text = line.partition(". ")
+    if sep and number.isdigit():
+        return int(number), text.strip()
+    return None
+
+def _lines(source: Union[IO, Iterable[str], str]) -> Iterator[str]:
+    if isinstance(source, str):
+        yield from io.StringIO(source)
+    elif isinstance(source, (io.RawIOBase, io.BufferedIOBase)):
+        # Decode byte streams incrementally instead of reading them whole;
+        # detach afterwards so the caller's stream is left open
+        wrapper = io.TextIOWrapper(source, encoding='utf-8')
+        try:
+            yield from wrapper
+        finally:
+            wrapper.detach()
+    else:
+        yield from source
+
+def iter_records(source: Union[IO, Iterable[str], str]) -> Iterator[ArticleRecord]:
+    """
+    Parse an article file line by line from a text or bytes stream, any iterable
+    of lines, or a string, yielding ArticleRecord items without holding the
+    whole text. Numbered lines only count as transitions under the
+    'Transitions générées:' header, or in a bare list with no section headers.
+    """
+    section = None
+    body_line = 0
+    for raw_line in _lines(source):
+        line = raw_line.strip()
+        if line.startswith(TRANSITIONS_HEADER):
+            section = "transitions"
+        elif section != "article" and line.startswith(TITLE_PREFIX):
+            section = "title"
+            yield ArticleRecord("title", None, line[len(TITLE_PREFIX):].strip())
+        elif section != "article" and line.startswith(CHAPO_PREFIX):
+            section = "chapo"
+            yield ArticleRecord("chapo", None, line[len(CHAPO_PREFIX):].strip())
+        elif section != "article" and line == ARTICLE_HEADER:
+            section = "article"
+        elif section == "article":
+            body_line += 1
+            yield ArticleRecord("article", body_line, raw_line.rstrip("\r\n"))
+        elif section in (None, "transitions") and line:
+            numbered = _parse_numbered(line)
+            if numbered:
+                yield ArticleRecord("transition", numbered[0], numbered[1])
+
+def iter_transitions(source: Union[IO, Iterable[str], str]) -> Iterator[str]:
+    """Yield only the generated transitions of an article file, in order."""
+    for record in iter_records(source):
+        if record.section == "transition":
+            yield record.text
+
+def parse_transitions(source: Union[IO, Iterable[str], str]) -> List[str]:
+    """List the generated transitions of an article file."""
+    return list(iter_transitions(source))
+
+def article_timestamp(filepath: str) -> datetime:
+    """Generation time from the article_YYYYMMDD_HHMMSS name, or the file mtime."""
+    match = FILENAME_TIMESTAMP.search(os.path.basename(filepath))
+    if match:
+        return datetime.strptime("".join(match.groups()), "%Y%m%d%H%M%S")
+    return datetime.fromtimestamp(os.path.getmtime(filepath))
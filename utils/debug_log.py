@@ -0,0 +1,56 @@
+import json
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+import streamlit as st
+from streamlit import runtime
+
+# Debug entries kept per session; older ones are dropped
+DEBUG_BUFFER_SIZE = int(st.secrets.get("DEBUG_BUFFER_SIZE", 50))
+
+DEBUG_KEY = "debug_mode"
+_BUFFER_KEY = "debug_entries"
+
+def _session_buffer() -> Optional[deque]:
+    # Off outside a Streamlit session (CLI scripts) and unless the session turned it on
+    if not runtime.exists() or not st.session_state.get(DEBUG_KEY, False):
+        return None
+    if _BUFFER_KEY not in st.session_state:
+        st.session_state[_BUFFER_KEY] = deque(maxlen=DEBUG_BUFFER_SIZE)
+    return st.session_state[_BUFFER_KEY]
+
+def record(kind: str, **fields) -> None:
+    """
+    Keep a debug entry for the current session. Fields are stored as given and
+    only serialized when shown in the debug panel; nothing is kept when debug
+    mode is off.
+    """
+    buffer = _session_buffer()
+    if buffer is not None:
+        buffer.append({"time": time.time(), "kind": kind, **fields})
+
+def debug_toggle() -> bool:
+    """Per-session debug mode checkbox, off by default."""
+    return st.checkbox("🧪 Mode debug (payloads et réponses du proxy)", key=DEBUG_KEY)
+
+def show_debug_panel() -> None:
+    """One collapsed panel listing the debug entries; only the selected entry is rendered."""
+    buffer = _session_buffer()
+    if buffer is None:
+        return
+    with st.expander(f"🧪 Debug ({len(buffer)} entrées)"):
+        if not buffer:
+            st.info("Aucune entrée de debug pour le moment.")
+            return
+        entries = list(reversed(buffer))
+        index = st.selectbox(
+            "Entrée",
+            range(len(entries)),
+            format_func=lambda i: (
+                f"{datetime.fromtimestamp(entries[i]['time']).strftime('%H:%M:%S')} - {entries[i]['kind']}"
+            )
+        )
+        st.code(json.dumps(entries[index], ensure_ascii=False, indent=2, default=str), language="json")
+        if st.button("Vider le journal de debug"):
+            buffer.clear()
@@ -28,6 +28,13 @@ def show_output(title, chapo, text):
     else:
         st.warning("Aucun texte généré pour l'article.")
 
+def show_partial_article(placeholder, parts, transitions):
+    """Render the article with the transitions received so far into a placeholder."""
+    text = parts[0].strip()
+    for part, transition in zip(parts[1:], transitions):
+        text += f"\n\n**{transition or '…'}**\n\n{part.strip()}"
+    placeholder.markdown(text.replace('\n', '  \n'))
+
 def show_warning_or_error(missing=False, not_enough=False):
     if missing:
         st.warning("⚠️ Aucune balise `TRANSITION` trouvée dans le texte.")
@@ -0,0 +1,97 @@
+import json
+import os
+from typing import Dict, Iterator, List, Tuple
+import streamlit as st
+from utils.logger import logger
+from utils.google_drive import iter_drive_downloads
+from utils.article_format import parse_transitions
+from utils.tracing import traced
+
+# Local copy of the Drive output folder: <file id>.txt holds the raw text,
+# <file id>.json the parsed transitions, and index.json the version of each file.
+MIRROR_DIR = st.secrets.get("gdrive_mirror_dir", "drive_mirror")
+INDEX_FILE = os.path.join(MIRROR_DIR, "index.json")
+# Bumped when the parsed transitions format changes, to re-parse mirrored files
+PARSER_VERSION = 2
+
+def _version(file: Dict) -> Dict:
+    return {
+        "name": file.get("name"),
+        "modifiedTime": file.get("modifiedTime"),
+        "md5Checksum": file.get("md5Checksum"),
+        "parser": PARSER_VERSION,
+    }
+
+def load_index() -> Dict[str, Dict]:
+    if not os.path.exists(INDEX_FILE):
+        return {}
+    try:
+        with open(INDEX_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Drive mirror index unreadable, starting a new one: {str(e)}")
+        return {}
+
+def _write_json(path: str, data) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def _is_current(index: Dict[str, Dict], file: Dict) -> bool:
+    entry = index.get(file["id"])
+    if entry is None or entry.get("parser") != PARSER_VERSION or not os.path.exists(os.path.join(MIRROR_DIR, f"{file['id']}.json")):
+        return False
+    # Prefer the checksum; fall back to the modification time when Drive has none
+    if file.get("md5Checksum") and entry.get("md5Checksum"):
+        return entry["md5Checksum"] == file["md5Checksum"]
+    return entry.get("modifiedTime") == file.get("modifiedTime")
+
+@traced("drive_sync")
+def sync_files(files: List[Dict]) -> Dict[str, int]:
+    """
+    Bring the mirror up to date for the given Drive files (as returned by
+    list_folder_contents). Only new or changed files are downloaded.
+    """
+    os.makedirs(MIRROR_DIR, exist_ok=True)
+    index = load_index()
+    stale = [file for file in files if not _is_current(index, file)]
+
+    downloaded = 0
+    for file, content in iter_drive_downloads(stale):
+        with open(os.path.join(MIRROR_DIR, f"{file['id']}.txt"), 'w', encoding='utf-8') as f:
+            f.write(content)
+        _write_json(os.path.join(MIRROR_DIR, f"{file['id']}.json"), parse_transitions(content))
+        index[file["id"]] = _version(file)
+        downloaded += 1
+
+    if downloaded:
+        _write_json(INDEX_FILE, index)
+    logger.info(f"Drive mirror: {downloaded} downloaded, {len(files) - len(stale)} unchanged")
+    return {"downloaded": downloaded, "unchanged": len(files) - len(stale), "failed": len(stale) - downloaded}
+
+def prune(files: List[Dict]) -> int:
+    """Remove mirrored files that are no longer in the Drive folder listing."""
+    index = load_index()
+    listed = {file["id"] for file in files}
+    removed = [file_id for file_id in index if file_id not in listed]
+    for file_id in removed:
+        for ext in (".txt", ".json"):
+            path = os.path.join(MIRROR_DIR, f"{file_id}{ext}")
+            if os.path.exists(path):
+                os.remove(path)
+        del index[file_id]
+    if removed:
+        _write_json(INDEX_FILE, index)
+    return len(removed)
+
+def iter_mirrored_transitions(files: List[Dict]) -> Iterator[Tuple[str, List[str]]]:
+    """Yield (filename, transitions) from the mirror for the given Drive files."""
+    for file in files:
+        path = os.path.join(MIRROR_DIR, f"{file['id']}.json")
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            transitions = json.load(f)
+        if transitions:
+            yield file["name"], transitions
@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+import httplib2
+import streamlit as st
+from google.oauth2 import service_account
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from utils.logger import logger
+
+# Parsed Drive v3 discovery document, kept on disk between runs
+DISCOVERY_PATH = os.path.join("cache", "discovery", "drive.v3.json")
+
+_lock = threading.Lock()
+_thread_local = threading.local()
+_discovery: Optional[Dict] = None
+_credentials: Dict[Tuple[str, ...], object] = {}
+
+def _load_discovery() -> Dict:
+    """Discovery document, read from disk once per process instead of on every build."""
+    global _discovery
+    if _discovery is None:
+        if os.path.exists(DISCOVERY_PATH):
+            with open(DISCOVERY_PATH, 'r', encoding='utf-8') as f:
+                _discovery = json.load(f)
+        else:
+            # Seed the on-disk copy from the document bundled with google-api-python-client
+            document = get_static_doc('drive', 'v3')
+            if document is None:
+                raise RuntimeError("No discovery document available for drive v3")
+            os.makedirs(os.path.dirname(DISCOVERY_PATH), exist_ok=True)
+            with open(DISCOVERY_PATH, 'w', encoding='utf-8') as f:
+                f.write(document)
+            _discovery = json.loads(document)
+    return _discovery
+
+def get_credentials(scopes: Sequence[str]):
+    """
+    Service account credentials for the given scopes, created once per process.
+    Access tokens are refreshed lazily by the HTTP layer when they expire.
+    A fake Drive server configured through gdrive_api_endpoint needs none.
+    """
+    key = tuple(sorted(scopes))
+    if key not in _credentials:
+        if st.secrets.get("gdrive_api_endpoint") and "gcp_service_account" not in st.secrets:
+            _credentials[key] = None
+        else:
+            _credentials[key] = service_account.Credentials.from_service_account_info(
+                st.secrets["gcp_service_account"], scopes=list(key))
+    return _credentials[key]
+
+def _build(scopes: Sequence[str]):
+    credentials = get_credentials(scopes)
+    endpoint = st.secrets.get("gdrive_api_endpoint")
+    if endpoint:
+        # e.g. a local fake Drive server
+        http = None if credentials else httplib2.Http()
+        return build_from_document(_load_discovery(), credentials=credentials, http=http,
+                                   client_options={"api_endpoint": endpoint})
+    return build_from_document(_load_discovery(), credentials=credentials)
+
+def get_drive_service(scopes: Sequence[str]):
+    """
+    Drive v3 client for the given scopes, owned by the calling thread.
+    httplib2 is not thread-safe and every Streamlit session runs on its own
+    thread, so each thread gets its own client and transport; only the
+    credentials and the parsed discovery document are shared by the process.
+    """
+    key = tuple(sorted(scopes))
+    services = getattr(_thread_local, "services", None)
+    if services is None:
+        services = _thread_local.services = {}
+    if key not in services:
+        with _lock:
+            # Credentials and the discovery document are created once per process
+            get_credentials(key)
+            _load_discovery()
+        services[key] = _build(key)
+        logger.debug(f"Built Google Drive service for scopes {list(key)} on thread {threading.current_thread().name}")
+    return services[key]
@@ -0,0 +1,156 @@
+# utils/example_index.py
+
+import os
+import threading
+import zlib
+from collections import Counter
+from typing import List
+import numpy as np
+from utils.io import ExampleStore, EXAMPLES_FILE, load_examples
+from utils.logger import logger
+from utils.validate_prompt_compliance import tokenize, FRENCH_STOPWORDS
+from utils.version import get_file_hash
+
+# Build artifact, not versioned: generate it with python -m utils.example_index
+# after changing transitions.json. Without it, or when it is stale, the index is
+# rebuilt in memory on first use.
+INDEX_FILE = 'transitions_index.npz'
+# Size of the hashed feature space; collisions are negligible at this size
+N_FEATURES = 1 << 20
+
+def _features(text: str) -> Counter:
+    """Hash the content words of a text into feature ids with their counts."""
+    return Counter(
+        zlib.crc32(word.encode('utf-8')) % N_FEATURES
+        for word in tokenize(text)
+        if word not in FRENCH_STOPWORDS
+    )
+
+class ExampleIndex:
+    """
+    TF-IDF retrieval index over the few-shot examples.
+    The document-term matrix is kept column-wise (one postings list per hashed
+    feature) in flat NumPy arrays, so a query only touches the postings of its
+    own words.
+    """
+
+    def __init__(self, features, indptr, rows, weights, idf, n_docs, source_hash=""):
+        self.features = features
+        self.indptr = indptr
+        self.rows = rows
+        self.weights = weights
+        self.idf = idf
+        self.n_docs = int(n_docs)
+        self.source_hash = str(source_hash)
+        # mtime of the example store this index was matched against
+        self.store_mtime = None
+
+    @classmethod
+    def build(cls, store: ExampleStore, source_hash: str = "") -> "ExampleIndex":
+        """Build the index from the paragraph pairs of an example store."""
+        doc_features = [_features(f"{a} {b}") for a, b in zip(store.paragraph_a, store.paragraph_b)]
+        n_docs = len(doc_features)
+
+        df = Counter()
+        for feats in doc_features:
+            df.update(feats.keys())
+        features = np.array(sorted(df), dtype=np.int64)
+        idf = np.log((1 + n_docs) / (1 + np.array([df[f] for f in features], dtype=np.float64))) + 1
+        position = {int(f): i for i, f in enumerate(features)}
+
+        postings = [[] for _ in features]
+        for row, feats in enumerate(doc_features):
+            if not feats:
+                continue
+            cols = np.array([position[f] for f in feats], dtype=np.int64)
+            vals = np.array(list(feats.values()), dtype=np.float64) * idf[cols]
+            vals /= np.linalg.norm(vals)
+            for col, val in zip(cols, vals):
+                postings[col].append((row, val))
+
+        indptr = np.zeros(len(features) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(p) for p in postings])
+        rows = np.array([r for p in postings for r, _ in p], dtype=np.int32)
+        weights = np.array([v for p in postings for _, v in p], dtype=np.float32)
+        return cls(features, indptr, rows, weights, idf.astype(np.float32), n_docs, source_hash)
+
+    def save(self, path: str = INDEX_FILE) -> None:
+        np.savez_compressed(
+            path, features=self.features, indptr=self.indptr, rows=self.rows,
+            weights=self.weights, idf=self.idf, n_docs=self.n_docs,
+            source_hash=self.source_hash
+        )
+
+    @classmethod
+    def load(cls, path: str = INDEX_FILE) -> "ExampleIndex":
+        with np.load(path) as data:
+            return cls(
+                data["features"], data["indptr"], data["rows"], data["weights"],
+                data["idf"], data["n_docs"], data["source_hash"]
+            )
+
+    def top_k(self, para_a: str, para_b: str, k: int = 3) -> List[int]:
+        """Return the indices of the k examples most similar to a paragraph pair."""
+        query = _features(f"{para_a} {para_b}")
+        if not query or self.n_docs == 0:
+            return []
+        hashed = np.fromiter(query.keys(), dtype=np.int64, count=len(query))
+        counts = np.fromiter(query.values(), dtype=np.float32, count=len(query))
+        cols = np.searchsorted(self.features, hashed)
+        known = cols < len(self.features)
+        known[known] = self.features[cols[known]] == hashed[known]
+        if not known.any():
+            return []
+        cols, counts = cols[known], counts[known]
+
+        q_weights = counts * self.idf[cols]
+        starts, ends = self.indptr[cols], self.indptr[cols + 1]
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        scores = np.bincount(
+            self.rows[offsets],
+            weights=self.weights[offsets] * np.repeat(q_weights, lengths),
+            minlength=self.n_docs
+        )
+
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        return best[np.argsort(-scores[best])].tolist()
+
+_index = None
+_index_lock = threading.Lock()
+
+def _matches(index, store: ExampleStore) -> bool:
+    return index is not None and index.n_docs == len(store) and index.store_mtime == store.mtime
+
+def get_example_index(store: ExampleStore) -> ExampleIndex:
+    """
+    Return the retrieval index matching the given example store.
+    The precomputed INDEX_FILE is used when it was built from the current
+    transitions.json; otherwise the index is rebuilt in memory.
+    """
+    global _index
+    if not _matches(_index, store):
+        with _index_lock:
+            if not _matches(_index, store):
+                source_hash = get_file_hash(EXAMPLES_FILE)
+                index = None
+                if os.path.exists(INDEX_FILE):
+                    index = ExampleIndex.load(INDEX_FILE)
+                    if index.source_hash != source_hash or index.n_docs != len(store):
+                        logger.warning(f"{INDEX_FILE} is stale, rebuilding example index in memory")
+                        index = None
+                if index is None:
+                    index = ExampleIndex.build(store, source_hash)
+                index.store_mtime = store.mtime
+                _index = index
+    return _index
+
+if __name__ == "__main__":
+    # Build the index offline: python -m utils.example_index
+    store = load_examples()
+    index = ExampleIndex.build(store, get_file_hash(EXAMPLES_FILE))
+    index.save(INDEX_FILE)
+    print(f"Saved index of {index.n_docs} examples ({len(index.features)} features) to {INDEX_FILE}")
@@ -0,0 +1,113 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Sequence
+from typing import Dict, List
+
+# Packed layout, all integers little-endian:
+#   header   b"TRPK", version (u32), row count (u32), field count (u32)
+#   fields   for each field: name length (u32) + UTF-8 name
+#   offsets  (row count * field count + 1) u64 offsets into the string data,
+#            row-major: string (row, field) spans offsets[k]..offsets[k + 1]
+#            with k = row * field count + field
+#   data     concatenated UTF-8 strings
+MAGIC = b"TRPK"
+VERSION = 1
+_HEADER = struct.Struct("<4sIII")
+_U32 = struct.Struct("<I")
+
+def write_pack(path: str, columns: Dict[str, Sequence]) -> None:
+    """Write equally long string columns to a packed file (written atomically)."""
+    names = list(columns)
+    n_rows = len(columns[names[0]]) if names else 0
+    if any(len(columns[name]) != n_rows for name in names):
+        raise ValueError("All columns must have the same length")
+
+    encoded = [
+        columns[name][row].encode('utf-8')
+        for row in range(n_rows) for name in names
+    ]
+    offsets = [0]
+    for blob in encoded:
+        offsets.append(offsets[-1] + len(blob))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, n_rows, len(names)))
+        for name in names:
+            raw = name.encode('utf-8')
+            f.write(_U32.pack(len(raw)) + raw)
+        f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        for blob in encoded:
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+class PackedColumn(Sequence):
+    """One field of a packed file; strings are decoded only when accessed."""
+
+    def __init__(self, pack: "PackedExamples", field: int):
+        self._pack = pack
+        self._field = field
+
+    def __len__(self) -> int:
+        return self._pack.n_rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("packed column index out of range")
+        return self._pack.get(index, self._field)
+
+class PackedExamples:
+    """
+    Memory-mapped reader for a packed file. Opening it only reads the header;
+    example i is decoded on access without deserializing the rest.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.n_rows, n_fields = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} example pack")
+
+        pos = _HEADER.size
+        self.fields: List[str] = []
+        for _ in range(n_fields):
+            (length,) = _U32.unpack_from(self._mmap, pos)
+            self.fields.append(bytes(self._mmap[pos + 4:pos + 4 + length]).decode('utf-8'))
+            pos += 4 + length
+
+        n_offsets = self.n_rows * n_fields + 1
+        self._offsets = memoryview(self._mmap)[pos:pos + 8 * n_offsets].cast('Q')
+        self._data_start = pos + 8 * n_offsets
+        self._n_fields = n_fields
+
+    def get(self, row: int, field: int) -> str:
+        k = row * self._n_fields + field
+        start = self._data_start + self._offsets[k]
+        end = self._data_start + self._offsets[k + 1]
+        return self._mmap[start:end].decode('utf-8')
+
+    def column(self, name: str) -> PackedColumn:
+        return PackedColumn(self, self.fields.index(name))
+
+def convert(json_path: str, pack_path: str) -> int:
+    """Validate a transitions JSON file and write it as a packed file. Returns the row count."""
+    from utils.io import ExampleStore, EXAMPLE_FIELDS
+    with open(json_path, 'r', encoding='utf-8') as f:
+        store = ExampleStore.from_records(json.load(f))
+    write_pack(pack_path, {field: getattr(store, field) for field in EXAMPLE_FIELDS})
+    return len(store)
+
+if __name__ == "__main__":
+    # python -m utils.example_pack [transitions.json] [transitions.pack]
+    source = sys.argv[1] if len(sys.argv) > 1 else 'transitions.json'
+    target = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(source)[0] + '.pack'
+    count = convert(source, target)
+    print(f"Packed {count} examples from {source} into {target}")
@@ -1,10 +1,17 @@
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import os
 import re
-from typing import List, Tuple
+from typing import Dict, Iterable, List, Sequence, Tuple
+import numpy as np
 from utils.validate_prompt_compliance import tokenize, extract_ngrams
-from utils.io import load_all_transitions  # to implement: returns List[List[str]]
+from utils.io import iter_transition_groups
+from utils.vocab import Vocabulary, ngram_keys, count_keys
 
 MIN_COUNT = 3
+# Transition groups per shard sent to a mining worker
+SHARD_SIZE = 500
 
 
 def get_top_ngrams(dataset: List[List[str]], n: int, min_count: int = MIN_COUNT) -> List[Tuple[str, int]]:
@@ -16,18 +23,103 @@ def get_top_ngrams(dataset: List[List[str]], n: int, min_count: int = MIN_COUNT)
     return [(ng, count) for ng, count in counter.items() if count >= min_count]
 
 
-def export_candidates_to_file(filename: str, bigrams: List[Tuple[str, int]], trigrams: List[Tuple[str, int]]):
+def count_shard(shard: List[List[str]], orders: Sequence[int]) -> Tuple[Counter, Counter]:
+    """
+    Count every n-gram order of a shard in one pass: each phrase is tokenized
+    once and interned as token ids, n-grams are packed into int64 keys (rows
+    of ids above utils.vocab.MAX_ORDER) and counted with np.unique. Returns (occurrence counts, document frequency),
+    where the document frequency is the number of groups an n-gram appears in.
+    Keys are (n, ngram).
+    """
+    vocab = Vocabulary()
+    flat_ids = []
+    lengths = []
+    phrase_groups = []
+    for group_index, group in enumerate(shard):
+        for phrase in group:
+            ids = vocab.intern(tokenize(phrase))
+            flat_ids.extend(ids)
+            lengths.append(len(ids))
+            phrase_groups.append(group_index)
+    # The whole shard is one id array; n-grams are built for all phrases at once
+    ids = np.array(flat_ids, dtype=np.int64)
+    lengths = np.array(lengths, dtype=np.int64)
+    token_groups = np.repeat(np.array(phrase_groups, dtype=np.int64), lengths)
+
+    counts = Counter()
+    doc_freq = Counter()
+    for n in orders:
+        keys, positions = ngram_keys(ids, n, lengths)
+        if not len(keys):
+            continue
+        unique, occurrences, df = count_keys(keys, token_groups[positions])
+        # Only the distinct n-grams of the shard are turned back into strings
+        for key, count, frequency in zip(unique.tolist(), occurrences.tolist(), df.tolist()):
+            ngram = (n, vocab.decode_key(key, n))
+            counts[ngram] = count
+            doc_freq[ngram] = frequency
+    return counts, doc_freq
+
+
+def _shards(groups: Iterable[List[str]], size: int):
+    groups = iter(groups)
+    while True:
+        shard = list(islice(groups, size))
+        if not shard:
+            return
+        yield shard
+
+
+def mine_ngrams(groups: Iterable[List[str]], orders: Sequence[int] = (2, 3), min_count: int = MIN_COUNT,
+                workers: int = None, shard_size: int = SHARD_SIZE) -> Dict[int, List[Tuple[str, int, int]]]:
+    """
+    Mine all n-gram orders over a stream of transition groups, map-reduce style:
+    shards are counted across a process pool and their counters merged.
+    At most two shards per worker are in flight, so the corpus is never fully loaded.
+    Returns {n: [(ngram, count, document frequency), ...]} for n-grams seen at least min_count times.
+    """
+    workers = workers or os.cpu_count() or 1
+    counts = Counter()
+    doc_freq = Counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for shard in _shards(groups, shard_size):
+            pending.append(executor.submit(count_shard, shard, tuple(orders)))
+            if len(pending) >= workers * 2:
+                shard_counts, shard_df = pending.pop(0).result()
+                counts.update(shard_counts)
+                doc_freq.update(shard_df)
+        for future in pending:
+            shard_counts, shard_df = future.result()
+            counts.update(shard_counts)
+            doc_freq.update(shard_df)
+
+    results = {n: [] for n in orders}
+    for (n, ngram), count in counts.items():
+        if count >= min_count:
+            results[n].append((ngram, count, doc_freq[(n, ngram)]))
+    return results
+
+
+def export_candidates_to_file(filename: str, bigrams: List[Tuple], trigrams: List[Tuple]):
+    """Write candidates as 'phrase (count)', or 'phrase (count, df=N)' when document frequencies are given."""
+    def _line(candidate):
+        if len(candidate) > 2:
+            phrase, count, df = candidate
+            return f"{phrase} ({count}, df={df})\n"
+        phrase, count = candidate
+        return f"{phrase} ({count})\n"
+
     with open(filename, 'w', encoding='utf-8') as f:
         f.write("Top Bigrams:\n")
-        for phrase, count in sorted(bigrams, key=lambda x: -x[1]):
-            f.write(f"{phrase} ({count})\n")
+        for candidate in sorted(bigrams, key=lambda x: -x[1]):
+            f.write(_line(candidate))
         f.write("\nTop Trigrams:\n")
-        for phrase, count in sorted(trigrams, key=lambda x: -x[1]):
-            f.write(f"{phrase} ({count})\n")
+        for candidate in sorted(trigrams, key=lambda x: -x[1]):
+            f.write(_line(candidate))
 
 
 def run_export():
-    dataset = load_all_transitions()  # To be implemented in io.py
-    bigrams = get_top_ngrams(dataset, n=2)
-    trigrams = get_top_ngrams(dataset, n=3)
-    export_candidates_to_file("candidates_for_gpt_review.txt", bigrams, trigrams) 
\ No newline at end of file
+    mined = mine_ngrams(iter_transition_groups(), orders=(2, 3))
+    export_candidates_to_file("candidates_for_gpt_review.txt", mined[2], mined[3])
@@ -1,31 +1,28 @@
-from googleapiclient.discovery import build
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from googleapiclient.http import MediaIoBaseDownload
 import streamlit as st
 from utils.logger import logger
-from google.oauth2 import service_account
+from utils.drive_service import get_drive_service
+from utils.article_format import parse_transitions
+from utils import tracing
 import io
 
 # Google Drive API setup
 # SCOPES are typically inferred or managed by sharing in Google Drive for service accounts.
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly'] # Keeping this for clarity, but service account permissions are key.
 
+# Concurrent downloads and retries (with exponential backoff on 429/5xx) per request
+MAX_DOWNLOAD_WORKERS = int(st.secrets.get("gdrive_download_workers", 8))
+NUM_RETRIES = int(st.secrets.get("gdrive_num_retries", 5))
+
 def get_google_drive_service():
-    """Get or create Google Drive service using a service account key from Streamlit secrets."""
+    """
+    Get the Google Drive service using a service account key from Streamlit secrets.
+    Credentials and the discovery document are loaded once per process; the
+    client itself belongs to the calling thread (see utils.drive_service).
+    """
     try:
-        # Get service account info from Streamlit secrets
-        # Reading from the correct key: gcp_service_account
-        service_account_info = st.secrets["gcp_service_account"]
-        
-        # Create credentials from service account info
-        creds = service_account.Credentials.from_service_account_info(
-            service_account_info,
-            scopes=SCOPES # Use the defined scopes
-        )
-        
-        # Build the service
-        service = build('drive', 'v3', credentials=creds)
-        logger.info("Successfully created Google Drive service using service account.")
-        return service
+        return get_drive_service(SCOPES)
         
     except KeyError as e:
         st.error(f"""
@@ -48,53 +45,75 @@ def get_google_drive_service():
         return None
 
 def list_folder_contents(service, folder_id):
-    """List all files in a Google Drive folder."""
-    results = service.files().list(
-        q=f"'{folder_id}' in parents and mimeType='text/plain'",
-        fields="files(id, name)",
-        pageSize=1000
-    ).execute()
-    return results.get('files', [])
+    """List all files in a Google Drive folder, following every result page."""
+    files = []
+    page_token = None
+    with tracing.span("drive_list") as span:
+        pages = 0
+        while True:
+            results = service.files().list(
+                q=f"'{folder_id}' in parents and mimeType='text/plain'",
+                fields="nextPageToken, files(id, name, modifiedTime, md5Checksum)",
+                pageSize=1000,
+                pageToken=page_token
+            ).execute(num_retries=NUM_RETRIES)
+            pages += 1
+            files.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                span.set(items=len(files), pages=pages)
+                return files
 
 def download_file_content(service, file_id):
     """Download content of a Google Drive file."""
-    request = service.files().get_media(fileId=file_id)
-    fh = io.BytesIO()
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while done is False:
-        status, done = downloader.next_chunk()
-    return fh.getvalue().decode('utf-8')
+    with tracing.span("drive_download", file_id=file_id) as span:
+        request = service.files().get_media(fileId=file_id)
+        fh = io.BytesIO()
+        downloader = MediaIoBaseDownload(fh, request)
+        done = False
+        while done is False:
+            status, done = downloader.next_chunk(num_retries=NUM_RETRIES)
+        span.set(bytes=fh.tell())
+        return fh.getvalue().decode('utf-8')
+
+def iter_drive_downloads(files, max_workers=None):
+    """
+    Download files concurrently and yield (file, content) for each file as
+    soon as its download finishes. Files that fail after retries are logged
+    and skipped.
+    """
+    if not files:
+        return
+    workers = max(1, min(max_workers or MAX_DOWNLOAD_WORKERS, len(files)))
+    trace_id = tracing.current_trace_id()
+
+    def _fetch(file):
+        tracing.set_trace_id(trace_id)
+        # httplib2 is not thread-safe, so each download thread uses its own service
+        return download_file_content(get_drive_service(SCOPES), file['id'])
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_fetch, file): file for file in files}
+        for future in as_completed(futures):
+            file = futures[future]
+            try:
+                content = future.result()
+            except Exception as e:
+                logger.error(f"Error processing file {file['name']}: {str(e)}")
+                continue
+            yield file, content
+
+def iter_drive_transitions(files, max_workers=None):
+    """
+    Yield (filename, transitions) for each file as soon as its download
+    finishes. Files without transitions are skipped.
+    """
+    for file, content in iter_drive_downloads(files, max_workers):
+        transitions = parse_transitions(content)
+        if transitions:
+            yield file['name'], transitions
 
 def process_drive_files(service, files):
     """Process multiple Google Drive files and return a list of (filename, transitions) tuples."""
-    results = []
-    
-    for file in files:
-        try:
-            # Download and read the file content
-            content = download_file_content(service, file['id'])
-            
-            # Split into lines and process
-            lines = content.strip().split('\n')
-            transitions = []
-            
-            # Extract transitions from the content
-            for line in lines:
-                line = line.strip()
-                if line.startswith("Transitions générées:"):
-                    continue
-                if line and line[0].isdigit() and ". " in line:
-                    # Extract transition text after the number and period
-                    transition = line.split(". ", 1)[1].strip()
-                    transitions.append(transition)
-            
-            if transitions:
-                filename = file['name']
-                results.append((filename, transitions))
-                
-        except Exception as e:
-            logger.error(f"Error processing file {file['name']}: {str(e)}")
-            continue
-            
-    return results 
\ No newline at end of file
+    order = {file['name']: i for i, file in enumerate(files)}
+    return sorted(iter_drive_transitions(files), key=lambda result: order[result[0]])
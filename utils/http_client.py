@@ -0,0 +1,37 @@
+# utils/http_client.py
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+import streamlit as st
+
+# Connection pool and timeout settings, tunable from Streamlit secrets
+POOL_SIZE = int(st.secrets.get("HTTP_POOL_SIZE", 10))
+CONNECT_TIMEOUT = float(st.secrets.get("HTTP_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(st.secrets.get("HTTP_READ_TIMEOUT", 60))
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide HTTP session.
+    The session keeps TCP/TLS connections alive and reuses them across
+    transition and title requests instead of reconnecting for every call.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"Connection": "keep-alive"})
+                _session = session
+    return _session
+
+def post(url: str, **kwargs) -> requests.Response:
+    """POST through the shared pooled session with default timeouts."""
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    return get_session().post(url, **kwargs)
@@ -1,50 +1,199 @@
 # utils/io.py
 
 import json
+import mmap
 import os
-from typing import List, Dict, Tuple
+import re
+import struct
+import threading
+from array import array
+from collections.abc import Sequence
+from typing import Iterator, List, Dict, Optional, Tuple
 import streamlit as st
 from utils.logger import logger
+from utils.example_pack import PackedExamples
 
-def load_examples() -> List[Dict]:
-    """Load few-shot examples from transitions.json"""
-    with open('transitions.json', 'r', encoding='utf-8') as f:
-        return json.load(f)
+EXAMPLES_FILE = 'transitions.json'
+EXAMPLE_FIELDS = ("paragraph_a", "transition", "paragraph_b")
+
+class ExampleStore(Sequence):
+    """
+    Read-only, column-oriented view of the few-shot examples.
+    Each field is kept in its own sequence (a tuple, or a memory-mapped column
+    of a packed file); indexing returns a plain dict so the store can be used
+    anywhere a list of example dicts was expected.
+    """
+
+    def __init__(self, paragraph_a: Sequence, transition: Sequence,
+                 paragraph_b: Sequence, mtime: float = 0.0):
+        self.paragraph_a = paragraph_a
+        self.transition = transition
+        self.paragraph_b = paragraph_b
+        self.mtime = mtime
+
+    @classmethod
+    def from_records(cls, records: List[Dict], mtime: float = 0.0) -> "ExampleStore":
+        """Validate raw example dicts once and pack them into columns."""
+        columns = {field: [] for field in EXAMPLE_FIELDS}
+        for i, ex in enumerate(records):
+            if not isinstance(ex, dict) or not all(isinstance(ex.get(f), str) for f in EXAMPLE_FIELDS):
+                raise ValueError(f"Example format invalid at index {i}: {ex}")
+            for field in EXAMPLE_FIELDS:
+                columns[field].append(ex[field].strip())
+        return cls(*(tuple(columns[f]) for f in EXAMPLE_FIELDS), mtime=mtime)
+
+    @classmethod
+    def from_pack(cls, path: str, mtime: float = 0.0) -> "ExampleStore":
+        """Open a packed file written by utils.example_pack; entries were validated when packing."""
+        pack = PackedExamples(path)
+        return cls(*(pack.column(f) for f in EXAMPLE_FIELDS), mtime=mtime)
+
+    def __len__(self) -> int:
+        return len(self.transition)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return {
+            "paragraph_a": self.paragraph_a[index],
+            "transition": self.transition[index],
+            "paragraph_b": self.paragraph_b[index],
+        }
+
+_example_store = None
+_example_store_lock = threading.Lock()
+
+def _examples_source(path: str) -> str:
+    """Use the packed copy of the examples (same name, .pack) when it is up to date."""
+    pack_path = os.path.splitext(path)[0] + '.pack'
+    if os.path.exists(pack_path) and os.path.getmtime(pack_path) >= os.path.getmtime(path):
+        return pack_path
+    return path
+
+def load_examples(path: str = EXAMPLES_FILE) -> ExampleStore:
+    """
+    Return the process-wide few-shot example store.
+    transitions.json (or its packed copy) is loaded and validated once, and
+    only reloaded when the modification time changes.
+    """
+    global _example_store
+    source = _examples_source(path)
+    mtime = os.path.getmtime(source)
+    if _example_store is None or _example_store.mtime != mtime:
+        with _example_store_lock:
+            if _example_store is None or _example_store.mtime != mtime:
+                if source.endswith('.pack'):
+                    _example_store = ExampleStore.from_pack(source, mtime=mtime)
+                else:
+                    with open(source, 'r', encoding='utf-8') as f:
+                        records = json.load(f)
+                    _example_store = ExampleStore.from_records(records, mtime=mtime)
+                logger.info(f"Loaded {len(_example_store)} examples from {source}")
+    return _example_store
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), '..', 'corpus')
+TRANSITIONS_MARKER = b"Transitions :"
+# A blank line, with \n, \r\n or \r line endings as in text mode
+GROUP_SEPARATOR = re.compile(rb"(?:\r\n|\r(?!\n)|\n){2}")
+_LINE_ENDING = re.compile(r"\r\n?")
+# Offsets of the transitions of each corpus file, reused while the file is unchanged
+CORPUS_INDEX_DIR = '.index'
+# The magic changes whenever the offsets are computed differently
+_INDEX_MAGIC = b"CIX2"
+_INDEX_HEADER = struct.Struct("<4sQQ")
+_WHITESPACE = b" \t\n\r\x0b\x0c"
+
+def _scan_group_offsets(mm: mmap.mmap) -> Optional[array]:
+    """(start, end) byte offsets of each transition in the 'Transitions :' section, or None."""
+    marker = mm.find(TRANSITIONS_MARKER)
+    if marker == -1:
+        return None
+    start = marker + len(TRANSITIONS_MARKER)
+    end = mm.find(TRANSITIONS_MARKER, start)
+    if end == -1:
+        end = len(mm)
+    # Same bounds as str.strip() on the section
+    while start < end and mm[start] in _WHITESPACE:
+        start += 1
+    while end > start and mm[end - 1] in _WHITESPACE:
+        end -= 1
+
+    offsets = array('Q')
+    while True:
+        sep = GROUP_SEPARATOR.search(mm, start, end)
+        if sep is None:
+            offsets.extend((start, end))
+            return offsets
+        offsets.extend((start, sep.start()))
+        start = sep.end()
+
+def _group_offsets(filepath: str, mm: mmap.mmap, use_index: bool) -> Optional[array]:
+    if not use_index:
+        return _scan_group_offsets(mm)
+    stat = os.stat(filepath)
+    index_path = os.path.join(os.path.dirname(filepath), CORPUS_INDEX_DIR, os.path.basename(filepath) + '.idx')
+    try:
+        with open(index_path, 'rb') as f:
+            magic, size, mtime_ns = _INDEX_HEADER.unpack(f.read(_INDEX_HEADER.size))
+            if magic == _INDEX_MAGIC and size == stat.st_size and mtime_ns == stat.st_mtime_ns:
+                offsets = array('Q')
+                offsets.frombytes(f.read())
+                return offsets or None
+    except (OSError, struct.error):
+        pass
+
+    offsets = _scan_group_offsets(mm)
+    try:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        with open(index_path, 'wb') as f:
+            f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, stat.st_size, stat.st_mtime_ns))
+            if offsets:
+                f.write(offsets.tobytes())
+    except OSError as e:
+        logger.warning(f"Could not write corpus index {index_path}: {str(e)}")
+    return offsets
+
+def iter_transition_groups(corpus_dir: str = CORPUS_DIR, use_index: bool = True) -> Iterator[List[str]]:
+    """
+    Lazily yield the transition group of each corpus file.
+    Files are memory-mapped and only the transitions themselves are decoded, so
+    memory stays bounded by the largest single group. With use_index, the byte
+    offsets of each file's transitions are kept under corpus/.index and reused
+    while the file's size and mtime are unchanged.
+    """
+    if not os.path.exists(corpus_dir):
+        return
+    for filename in os.listdir(corpus_dir):
+        if not filename.endswith('.txt'):
+            continue
+        filepath = os.path.join(corpus_dir, filename)
+        try:
+            if os.path.getsize(filepath) == 0:
+                continue
+            with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                offsets = _group_offsets(filepath, mm, use_index)
+                if offsets:
+                    # Line endings are normalized to \n as when reading in text mode
+                    group = [
+                        _LINE_ENDING.sub("\n", mm[offsets[i]:offsets[i + 1]].decode('utf-8'))
+                        for i in range(0, len(offsets), 2)
+                    ]
+                else:
+                    group = None
+            if group:
+                yield group
+        except Exception as e:
+            logger.error(f"Error processing file {filename}: {str(e)}")
 
 def load_all_transitions() -> List[List[str]]:
     """
     Load all transitions from the corpus files.
     Returns a list of transition groups, where each group is a list of transitions.
+    Use iter_transition_groups to stream large corpora instead.
     """
-    transitions = []
-    corpus_dir = os.path.join(os.path.dirname(__file__), '..', 'corpus')
     # Create corpus directory if it doesn't exist
-    if not os.path.exists(corpus_dir):
-        os.makedirs(corpus_dir)
-        logger.info(f"Created corpus directory at {corpus_dir}")
+    if not os.path.exists(CORPUS_DIR):
+        os.makedirs(CORPUS_DIR)
+        logger.info(f"Created corpus directory at {CORPUS_DIR}")
         return []
-    
-    # Process each file in the corpus directory
-    for filename in os.listdir(corpus_dir):
-        if filename.endswith('.txt'):
-            filepath = os.path.join(corpus_dir, filename)
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    
-                # Extract transitions section
-                if "Transitions :" in content:
-                    transitions_section = content.split("Transitions :")[1].strip()
-                    # Parse numbered transitions
-                    transition_group = []
-                    for line in transitions_section.split('\n\n'):
-                        transition_group.append(line)
-                        # if line.strip() and line[0].isdigit():
-                        #     # Remove the number and dot prefix
-                        #     transition = line.split('.', 1)[1].strip()
-                        #     transition_group.append(transition)
-                    if transition_group:
-                        transitions.append(transition_group)
-            except Exception as e:
-                logger.error(f"Error processing file {filename}: {str(e)}")
-    return transitions
\ No newline at end of file
+    return list(iter_transition_groups())
@@ -1,5 +1,7 @@
 import streamlit as st
+from utils.tracing import traced
 
+@traced("rebuild")
 def rebuild_article_with_transitions(user_input, transitions):
     """
     Rebuilds the article by inserting validated transitions between paragraph segments.
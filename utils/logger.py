@@ -2,9 +2,8 @@ import os
 import logging
 from datetime import datetime
 from typing import Optional
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
+from utils.article_format import write_article
 
 # Create logs directory if it doesn't exist
 log_dir = "logs"
@@ -43,19 +42,15 @@ def upload_to_gdrive(file_path: str, file_name: str, folder_id=None) -> Optional
         # Use broader scope for full drive access
         SCOPES = ['https://www.googleapis.com/auth/drive']
         
-        # Use Streamlit secrets for Google Drive credentials
+        # Use Streamlit secrets for Google Drive credentials; the service is cached per process
         try:
             import streamlit as st
-            service_account_info = st.secrets["gcp_service_account"]
-            logger.info(f"Service account email: {service_account_info.get('client_email')}")
-            credentials = service_account.Credentials.from_service_account_info(
-                service_account_info, scopes=SCOPES)
+            from utils.drive_service import get_drive_service
+            service = get_drive_service(SCOPES)
         except Exception as e:
             logger.error(f"Failed to load Google Drive credentials: {str(e)}")
             return None
 
-        service = build('drive', 'v3', credentials=credentials)
-
         # Get folder ID from Streamlit secrets or use default
         try:
             folder_id = st.secrets.get("gdrive_folder_id")
@@ -121,8 +116,10 @@ def upload_to_gdrive(file_path: str, file_name: str, folder_id=None) -> Optional
 
 def save_output_to_file(title: str, chapo: str, article_text: str, transitions: list[str]) -> Optional[str]:
     """
-    Saves the generated article and transitions to a file and uploads it to Google Drive.
-    Returns the Google Drive URL if successful, None otherwise.
+    Saves the generated article and transitions to a file and queues it for upload to Google Drive.
+    The upload runs in the background (see utils.upload_queue) and is retried with backoff
+    until it succeeds or its attempts are spent.
+    Returns the local file path if successful, None otherwise.
     """
     try:
         # Create outputs directory if it doesn't exist
@@ -136,26 +133,15 @@ def save_output_to_file(title: str, chapo: str, article_text: str, transitions:
 
         # Write content to file
         with open(filepath, "w", encoding="utf-8") as f:
-            f.write(f"Titre: {title}\n\n")
-            f.write(f"Chapeau: {chapo}\n\n")
-            f.write("Article:\n")
-            f.write(article_text.strip() + "\n\n")
-            f.write("Transitions générées:\n")
-            for i, t in enumerate(transitions, 1):
-                f.write(f"{i}. {t}\n")
+            write_article(f, title, chapo, article_text, transitions)
 
         logger.info(f"Successfully saved article to {filepath}")
 
-        # Upload to Google Drive
-        gdrive_file_id = upload_to_gdrive(filepath, filename)
-        if gdrive_file_id:
-            logger.info(f"Successfully uploaded to Google Drive with file ID: {gdrive_file_id}")
-            return filepath
-        else:
-            logger.warning("File saved locally but upload to Google Drive failed")
-            # return filepath  # Return filepath even if upload fails
-            return None
+        # Queue the Google Drive upload; imported here since upload_queue uses this logger
+        from utils.upload_queue import enqueue_upload
+        enqueue_upload(filepath, filename)
+        return filepath
 
     except Exception as e:
         logger.error(f"Error saving output: {str(e)}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,178 @@
+import ast
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Tuple
+
+# Local stand-in for the LLM proxy, for tests and payload comparisons.
+# It accepts both request shapes sent by utils.processing:
+#   {"prompt": "<str(payload)>"}  (legacy)  and  {"model", "messages", ...}  (chat)
+# and answers {"status": "success", "reply": ..., "usage": {...}}. Token counts
+# are estimated at 4 characters per token. Latency is simulated as a fixed cost
+# plus a cost per uncached prompt token; in chat mode a system prompt already
+# seen counts as a cached prefix, as with provider-side prompt caching.
+# Chat requests with "stream": true are answered as server-sent events, one
+# word per chunk; streamed_tokens counts the chunks actually delivered before
+# the client closed the connection. failure_rate makes that share of requests
+# fail with failure_status, to exercise retries and the circuit breaker.
+CHARS_PER_TOKEN = 4
+MARKER = re.compile(r"\[TRANSITION (\d+)\]")
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+class MockProxy(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, base_latency: float = 0.05, latency_per_1k_tokens: float = 0.2,
+                 latency_per_output_token: float = 0.02, failure_rate: float = 0.0,
+                 failure_status: int = 503, seed: int = 0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.base_latency = base_latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.latency_per_output_token = latency_per_output_token
+        self.streamed_tokens = 0
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self.requests: List[Dict] = []
+        self._seen_prefixes = set()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def start(self) -> "MockProxy":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def complete(self, body: Dict) -> Dict:
+        if "messages" in body:
+            messages = body["messages"]
+            prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+            cached_tokens = self._cached_prefix_tokens(messages)
+        else:
+            prompt = body.get("prompt", "")
+            prompt_tokens = estimate_tokens(prompt)
+            cached_tokens = 0
+            try:
+                messages = ast.literal_eval(prompt)["messages"]
+            except (ValueError, SyntaxError, KeyError, TypeError):
+                # Plain text prompt, e.g. the title and chapo request
+                messages = [{"role": "user", "content": prompt}]
+
+        with self._lock:
+            self.requests.append(body)
+        time.sleep(self.base_latency + self.latency_per_1k_tokens * (prompt_tokens - cached_tokens) / 1000)
+
+        reply = self._reply(messages)
+        if not body.get("stream"):
+            # A non-streamed reply arrives once every word has been generated
+            time.sleep(self.latency_per_output_token * len(reply.split()))
+        return {
+            "status": "success",
+            "reply": reply,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": estimate_tokens(reply),
+                "prompt_tokens_details": {"cached_tokens": cached_tokens}
+            }
+        }
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            failed = self._rng.random() < self.failure_rate
+            self.failures += failed
+        return failed
+
+    def stream(self, body: Dict) -> Iterator[str]:
+        """Words of the reply, each after the simulated per-token delay."""
+        reply = self.complete(body)["reply"]
+        for word in re.findall(r"\S+\s*", reply):
+            time.sleep(self.latency_per_output_token)
+            yield word
+
+    def _cached_prefix_tokens(self, messages: List[Dict]) -> int:
+        if not messages or messages[0]["role"] != "system":
+            return 0
+        prefix = messages[0]["content"]
+        with self._lock:
+            seen = prefix in self._seen_prefixes
+            self._seen_prefixes.add(prefix)
+        return estimate_tokens(prefix) if seen else 0
+
+    @staticmethod
+    def _reply(messages: List[Dict]) -> str:
+        last = messages[-1]["content"] if messages else ""
+        markers = MARKER.findall(last)
+        if markers:
+            return "\n".join(f"{n}. Transition numéro {n}," for n in markers)
+        if "TRANSITION" in last:
+            # Longer than the 5-word limit, like a model that does not stop in time
+            return "Par ailleurs, on note que la situation évolue toujours."
+        return "Titre : Titre de test\nChapeau : Chapeau de test"
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so event streams can be sent with chunked transfer encoding
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length))
+            if self.server.should_fail():
+                status, data = self.server.failure_status, {"status": "error", "error": "Simulated failure"}
+            elif body.get("stream") and "messages" in body:
+                self._send_stream(body)
+                return
+            else:
+                status, data = 200, self.server.complete(body)
+        except (ValueError, KeyError) as e:
+            status, data = 400, {"status": "error", "error": str(e)}
+        out = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def _send_stream(self, body: Dict) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for word in self.server.stream(body):
+                chunk = {"choices": [{"delta": {"content": word}}]}
+                self._write_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                with self.server._lock:
+                    self.server.streamed_tokens += 1
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading once it had a complete transition
+            pass
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+def start(port: int = 0, **kwargs) -> Tuple[MockProxy, str]:
+    """Start a mock proxy in a background thread. Returns the server and its URL."""
+    server = MockProxy(port, **kwargs).start()
+    return server, server.url
+
+if __name__ == "__main__":
+    # python -m utils.mock_proxy [port]: point API_URL at the printed URL
+    server = MockProxy(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
+    print(f"Mock proxy listening on {server.url}")
+    server.serve_forever()
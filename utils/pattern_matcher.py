@@ -0,0 +1,69 @@
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Tuple
+
+class PatternMatcher:
+    """
+    Token-level Aho–Corasick automaton over a list of multi-word patterns.
+    Built once, it finds every occurrence of every pattern, whatever its length,
+    in a single left-to-right scan of a token list.
+    """
+
+    def __init__(self, patterns: Iterable[str], tokenizer: Callable[[str], List[str]]):
+        # Node 0 is the root; each node has its goto edges, a failure link and
+        # the (pattern, length) pairs that end at it.
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, int]]] = [[]]
+        self.patterns: List[str] = []
+
+        seen = set()
+        for pattern in patterns:
+            tokens = tuple(tokenizer(pattern))
+            # Patterns that tokenize identically are reported once, under the first spelling
+            if not tokens or tokens in seen:
+                continue
+            seen.add(tokens)
+            self.patterns.append(pattern)
+            self._insert(pattern, tokens)
+        self._build_failure_links()
+
+    def _insert(self, pattern: str, tokens: Tuple[str, ...]) -> None:
+        node = 0
+        for token in tokens:
+            next_node = self._goto[node].get(token)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][token] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append((pattern, len(tokens)))
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(token, 0)
+                # Inherit the matches that end at the failure target (suffix patterns)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, tokens: List[str]) -> List[Tuple[str, int]]:
+        """
+        Return every (pattern, start position) found in a token list,
+        ordered by the position where the match ends.
+        """
+        matches = []
+        node = 0
+        for end, token in enumerate(tokens):
+            while node and token not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(token, 0)
+            for pattern, length in self._output[node]:
+                matches.append((pattern, end - length + 1))
+        return matches
@@ -1,9 +1,22 @@
 # utils/processing.py
 
+import hashlib
+import json
 import random
-import requests
+import re
 import os
+from concurrent.futures import ThreadPoolExecutor
+import requests
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from utils import debug_log, response_cache, tracing
+from utils.resilience import (
+    CircuitOpenError, PartialResultError, ProxyError, RetryBudget, breaker, post_with_retries
+)
+from utils.io import ExampleStore
+from utils.example_index import get_example_index
+from utils.logger import logger
+from utils.validate_prompt_compliance import IncrementalValidator
 
 # Get token and URL from Streamlit secrets
 API_TOKEN = st.secrets.get("API_TOKEN")
@@ -14,72 +27,496 @@ if not API_TOKEN:
 if not API_URL:
     raise ValueError("API_URL not found in Streamlit secrets")
 
-def get_transition_from_gpt(para_a, para_b, examples, model="gpt-4"):
+# How requests are sent to the proxy: "prompt" wraps the whole request in one
+# string field (legacy contract), "chat" sends the chat-completions fields,
+# messages included, as native JSON so the constant system prompt stays a
+# stable prefix the provider can cache
+PAYLOAD_MODE = st.secrets.get("API_PAYLOAD_MODE", "prompt")
+if PAYLOAD_MODE not in ("prompt", "chat"):
+    raise ValueError(f"Unknown API_PAYLOAD_MODE: {PAYLOAD_MODE}")
+
+# Streamed replies (chat mode only) are read as server-sent events and a single
+# transition is cut off as soon as it is complete, see complete_transition
+STREAMING = str(st.secrets.get("API_STREAMING", False)).lower() in ("1", "true", "yes")
+# Word limit of a transition given in SYSTEM_PROMPT, used to stop streamed replies
+MAX_TRANSITION_WORDS = int(st.secrets.get("MAX_TRANSITION_WORDS", 5))
+# A period right after a digit is a list number or a date, not the end
+TRANSITION_END = re.compile(r"(?<!\d)[.!?…]|\n")
+
+# Maximum number of transition requests in flight at once for one article
+MAX_IN_FLIGHT = int(st.secrets.get("MAX_IN_FLIGHT", 6))
+
+NUMBERED_LINE = re.compile(r"^\s*(\d+)\s*[.)]\s*(.+)$")
+
+def select_examples(para_a, para_b, examples, k=3, use_cache=True):
     """
-    Generate a context-aware French transition (max 5 words)
-    using few-shot prompting from the examples list and OpenAI GPT.
+    Pick the k few-shot examples closest to the paragraph pair using the
+    precomputed retrieval index, topping up with random examples if fewer match.
     """
-    # Select 3 random examples for few-shot context
-    selected_examples = random.sample(examples, min(3, len(examples)))
-
-    system_prompt = (
-        "Tu es un assistant de presse francophone. "
-        "Ta tâche est d'insérer une transition brève et naturelle (5 mots maximum) "
-        "entre deux paragraphes d'actualité régionale. "
-        "La transition doit être journalistique, fluide, neutre et ne pas répéter les débuts comme 'Par ailleurs' ou parallèlement ou sujet. "
-        "La dernière transition de l’article doit signaler clairement la fin de l’article. "
-        "Utilise uniquement une des formules de clôture suivantes pour la dernière transition : "
-        "Enfin, Et pour finir, Pour terminer, En guise de conclusion, En conclusion, En guise de mot de la fin, "
-        "Pour clore cette revue, Pour conclure cette sélection, Dernier point à noter, Pour refermer ce tour d’horizon. "
-        "Ces formules de conclusion ne doivent apparaître qu’une seule fois, à la toute fin. "
-        "Si tu utilises 'Par ailleurs', étoffe la formulation : par exemple 'Par ailleurs, on annonce que'. "
-        "Évite 'En parallèle'."
-    )
+    if isinstance(examples, ExampleStore):
+        indices = get_example_index(examples).top_k(para_a, para_b, k)
+    else:
+        indices = []
+    if len(indices) < min(k, len(examples)):
+        # With the cache enabled the draw is seeded by the paragraph pair so a
+        # replayed article builds the same prompt and hits the cache.
+        if use_cache:
+            seed = hashlib.sha256(f"{para_a.strip()}\x00{para_b.strip()}".encode("utf-8")).hexdigest()
+            rng = random.Random(seed)
+        else:
+            rng = random
+        remaining = [i for i in range(len(examples)) if i not in indices]
+        indices += rng.sample(remaining, min(k, len(examples)) - len(indices))
+    return [examples[i] for i in indices]
 
-    # Prepare messages for OpenAI chat completion
-    messages = [{"role": "system", "content": system_prompt}]
-    for ex in selected_examples:
-        if "paragraph_a" in ex and "paragraph_b" in ex and "transition" in ex:
-            messages.append({
-                "role": "user",
-                "content": f"{ex['paragraph_a'].strip()}\nTRANSITION\n{ex['paragraph_b'].strip()}"
-            })
-            messages.append({"role": "assistant", "content": ex["transition"].strip()})
+SYSTEM_PROMPT = (
+    "Tu es un assistant de presse francophone. "
+    "Ta tâche est d'insérer une transition brève et naturelle (5 mots maximum) "
+    "entre deux paragraphes d'actualité régionale. "
+    "La transition doit être journalistique, fluide, neutre et ne pas répéter les débuts comme 'Par ailleurs' ou parallèlement ou sujet. "
+    "La dernière transition de l’article doit signaler clairement la fin de l’article. "
+    "Utilise uniquement une des formules de clôture suivantes pour la dernière transition : "
+    "Enfin, Et pour finir, Pour terminer, En guise de conclusion, En conclusion, En guise de mot de la fin, "
+    "Pour clore cette revue, Pour conclure cette sélection, Dernier point à noter, Pour refermer ce tour d’horizon. "
+    "Ces formules de conclusion ne doivent apparaître qu’une seule fois, à la toute fin. "
+    "Si tu utilises 'Par ailleurs', étoffe la formulation : par exemple 'Par ailleurs, on annonce que'. "
+    "Évite 'En parallèle'."
+)
+
+BATCH_INSTRUCTIONS = (
+    "Tu reçois un article entier dont les paragraphes sont séparés par des balises "
+    "numérotées [TRANSITION 1], [TRANSITION 2], etc. "
+    "Rédige une transition pour chaque balise, dans l'ordre, sans répéter le même début. "
+    "Seule la dernière transition peut utiliser une formule de clôture. "
+    "Réponds uniquement par une liste numérotée, une transition par ligne, au format : "
+    "1. transition"
+)
+
+# Max regeneration rounds when repairing an article's transitions
+REPAIR_MAX_ROUNDS = int(st.secrets.get("REPAIR_MAX_ROUNDS", 3))
+
+# Max tokens allowed per transition in a completion
+TOKENS_PER_TRANSITION = 20
+
+def _request_completion(messages, model, temperature, max_tokens, use_cache=True,
+                        stream=False, stop=None, on_text=None):
+    """
+    Send a chat prompt to the proxy, going through the response cache.
+    When streaming, on_text gets the reply text received so far after every
+    chunk, and stop(text) may return the final reply to end the stream early.
+    """
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }
+    with tracing.span(
+        "llm_request", model=model, max_tokens=max_tokens,
+        prompt_chars=sum(len(m["content"]) for m in messages)
+    ) as span:
+        cache_key = response_cache.make_key(messages, model, temperature, max_tokens)
+        if use_cache:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                span.set(cache_hit=True, completion_chars=len(cached))
+                if on_text:
+                    on_text(cached)
+                return cached
+        span.set(cache_hit=False)
+        if stream and PAYLOAD_MODE == "chat":
+            reply = _stream_completion(payload, span, stop, on_text)
         else:
-            raise ValueError(f"Example format invalid: {ex}")
+            reply = _post_completion(payload, span)
+            if on_text:
+                on_text(reply)
+        span.set(completion_chars=len(reply))
+    response_cache.put(cache_key, reply)
+    return reply
 
-    # Add the real paragraph pair
-    messages.append({
-        "role": "user",
-        "content": f"{para_a.strip()}\nTRANSITION\n{para_b.strip()}"
-    })
+# Errors raised while reading or parsing a reply body: a dropped connection
+# (ChunkedEncodingError), invalid JSON or UTF-8, or an unexpected JSON shape
+_BODY_ERRORS = (requests.RequestException, ValueError, KeyError, IndexError)
 
+def _post_completion(payload, span):
+    """Send one prompt to the proxy and return the stripped reply."""
     # Send request to your proxy endpoint
     headers = {
         "Authorization": f"Bearer {API_TOKEN}",
         "Content-Type": "application/json"
     }
 
-    payload = {
-        "model": model,
-        "messages": messages,
-        "temperature": 0.5,
-        "max_tokens": 20
-    }
-    # 🧪 Debug: show payload
-    st.write("🧪 Prompt payload sent to proxy:")
-    st.json(payload)
-
-    response = requests.post(API_URL, headers=headers, json={"prompt": str(payload)})
-    # 🧪 Debug: show response
-    data = response.json()
-    st.write("🧪 Raw response from proxy:")
-    st.json(data)
+    # Kept by reference for the debug panel, serialized only if it is shown
+    debug_log.record("proxy_request", payload=payload)
+
+    body = payload if PAYLOAD_MODE == "chat" else {"prompt": str(payload)}
+    response = post_with_retries(API_URL, span=span, headers=headers, json=body)
     if response.status_code != 200:
-        raise Exception(f"API request failed with status code {response.status_code}")
+        debug_log.record("proxy_error", status_code=response.status_code, body=response.text)
+        raise ProxyError(f"API request failed with status code {response.status_code}", response.status_code)
+    return _parse_reply(response, span)
 
-    data = response.json()
+def _parse_reply(response, span):
+    """Stripped reply of a 200 JSON response; a body that cannot be read or parsed raises ProxyError."""
+    try:
+        data = response.json()
+        debug_log.record("proxy_response", data=data)
+        reply = _reply_text(data).strip()
+        # Token counts are only known when the proxy reports them
+        usage = data.get("usage") or {}
+        span.set(
+            status_code=response.status_code,
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+            cached_tokens=(usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        )
+    except _BODY_ERRORS + (AttributeError, TypeError) as e:
+        raise ProxyError(f"Invalid API response: {type(e).__name__}: {e}") from e
+    return reply
+
+def _iter_stream_text(response):
+    """Text deltas of a server-sent events chat-completions stream."""
+    # chunk_size=None hands over data as it arrives instead of filling 512-byte reads
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        chunk = json.loads(data)
+        choices = chunk.get("choices") or []
+        delta = choices[0].get("delta", {}).get("content") if choices else chunk.get("reply")
+        if delta:
+            yield delta
+
+def _stream_completion(payload, span, stop=None, on_text=None):
+    """
+    Stream one prompt's reply, stopping as soon as stop(text) returns a reply.
+    Closing the response early drops the connection so the rest of the
+    completion is not generated. Falls back to a plain reply when the proxy
+    does not answer with an event stream. A stream that breaks before any
+    text arrived is requested again; once text was shown it raises ProxyError.
+    """
+    headers = {
+        "Authorization": f"Bearer {API_TOKEN}",
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream"
+    }
+    debug_log.record("proxy_request", payload=payload, stream=True)
+
+    # One retry budget for the request, whether the POST or the stream fails
+    budget = RetryBudget()
+    while True:
+        response = post_with_retries(
+            API_URL, span=span, budget=budget, headers=headers, json={**payload, "stream": True}, stream=True
+        )
+        text = ""
+        try:
+            if response.status_code != 200:
+                debug_log.record("proxy_error", status_code=response.status_code, body=response.text)
+                raise ProxyError(f"API request failed with status code {response.status_code}", response.status_code)
+            if not response.headers.get("Content-Type", "").startswith("text/event-stream"):
+                reply = _parse_reply(response, span)
+                if on_text:
+                    on_text(reply)
+                return reply
+
+            response.encoding = "utf-8"
+            chunks = 0
+            for delta in _iter_stream_text(response):
+                text += delta
+                chunks += 1
+                if on_text:
+                    on_text(text)
+                final = stop(text) if stop else None
+                if final is not None:
+                    span.set(status_code=200, chunks=chunks, early_stop=True)
+                    debug_log.record("proxy_response", reply=final, chunks=chunks, early_stop=True)
+                    return final
+            span.set(status_code=200, chunks=chunks, early_stop=False)
+            debug_log.record("proxy_response", reply=text, chunks=chunks, early_stop=False)
+            return text.strip()
+        except _BODY_ERRORS as e:
+            # The headers counted as a success; a broken body is a proxy failure too
+            breaker.record_failure()
+            failure = ProxyError(f"API stream failed: {type(e).__name__}: {e}")
+            if text:
+                raise failure from e
+        finally:
+            response.close()
+        budget.spend(failure, span)
+
+def complete_transition(text):
+    """
+    The transition contained in a partial streamed reply once it is complete:
+    up to terminal punctuation or the end of the line, or its first
+    MAX_TRANSITION_WORDS words once a following word has started. None if the
+    transition may still grow.
+    """
+    text = text.lstrip()
+    end = TRANSITION_END.search(text)
+    if end:
+        cut = end.start() if end.group() == "\n" else end.end()
+        if text[:cut].strip():
+            return text[:cut].strip()
+    words = text.split()
+    if len(words) > MAX_TRANSITION_WORDS:
+        return " ".join(words[:MAX_TRANSITION_WORDS])
+    return None
+
+def _reply_text(data):
+    """Reply of a proxy response: {"status", "reply"} or a chat-completions "choices" list."""
+    if "choices" in data:
+        return data["choices"][0]["message"]["content"]
     if data.get("status") != "success":
-        raise Exception(f"API request failed: {data.get('error', 'Unknown error')}")
+        raise ProxyError(f"API request failed: {data.get('error', 'Unknown error')}")
+    return data["reply"]
+
+def _few_shot_messages(selected_examples):
+    # Examples are validated and stripped once when the store is loaded
+    messages = []
+    for ex in selected_examples:
+        messages.append({
+            "role": "user",
+            "content": f"{ex['paragraph_a']}\nTRANSITION\n{ex['paragraph_b']}"
+        })
+        messages.append({"role": "assistant", "content": ex["transition"]})
+    return messages
+
+def _batch_few_shot_messages(selected_examples):
+    # Same examples in the batch reply shape: marked paragraphs answered by a numbered list
+    messages = []
+    for ex in selected_examples:
+        messages.append({
+            "role": "user",
+            "content": f"{ex['paragraph_a']}\n\n[TRANSITION 1]\n\n{ex['paragraph_b']}"
+        })
+        messages.append({"role": "assistant", "content": f"1. {ex['transition']}"})
+    return messages
+
+@tracing.traced("transition")
+def get_transition_from_gpt(para_a, para_b, examples, model="gpt-4", use_cache=True,
+                            stream=False, on_text=None, avoid=None):
+    """
+    Generate a context-aware French transition (max 5 words)
+    using few-shot prompting from the examples list and OpenAI GPT.
+    Replies are served from the on-disk response cache unless use_cache is False.
+    When streaming, the reply is cut off as soon as the transition is complete
+    and on_text receives the partial text as it arrives.
+    avoid lists words and transitions the reply must not reuse; they are added
+    to the prompt, so such replies are cached under their own key.
+    """
+    selected_examples = select_examples(para_a, para_b, examples, use_cache=use_cache)
+
+    # Prepare messages for OpenAI chat completion
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    messages.extend(_few_shot_messages(selected_examples))
+
+    # Add the real paragraph pair
+    content = f"{para_a.strip()}\nTRANSITION\n{para_b.strip()}"
+    if avoid:
+        content += (
+            "\n\nN'utilise aucun de ces mots ou transitions, déjà présents dans l'article : "
+            + ", ".join(f"« {item} »" for item in avoid)
+        )
+    messages.append({"role": "user", "content": content})
+
+    return _request_completion(
+        messages, model, 0.5, TOKENS_PER_TRANSITION, use_cache,
+        stream=stream, stop=complete_transition, on_text=on_text
+    )
+
+def parse_numbered_transitions(reply):
+    """Parse a '1. transition' list from a batch reply, in the order given."""
+    transitions = []
+    for line in reply.splitlines():
+        match = NUMBERED_LINE.match(line)
+        if match:
+            transitions.append(match.group(2).strip())
+    return transitions
+
+@tracing.traced("transition_batch")
+def get_transitions_batch(parts, examples, model="gpt-4", use_cache=True, stream=False, on_partial=None):
+    """
+    Generate all the transitions of an article with a single request.
+
+    The whole article is sent once with numbered markers, so the system prompt
+    and examples are paid for once and the closing-phrase rule can be applied
+    across the article. Returns None when the reply does not contain exactly
+    one transition per marker. on_partial(index, text) is called as the
+    numbered lines of the reply come in.
+    """
+    segments = [part.strip() for part in parts]
+    expected = len(segments) - 1
+    if expected < 1:
+        return []
+
+    selected_examples = select_examples(segments[0], segments[-1], examples, use_cache=use_cache)
+
+    article = segments[0]
+    for i, segment in enumerate(segments[1:], 1):
+        article += f"\n\n[TRANSITION {i}]\n\n{segment}"
+
+    messages = [{"role": "system", "content": f"{SYSTEM_PROMPT}\n\n{BATCH_INSTRUCTIONS}"}]
+    messages.extend(_batch_few_shot_messages(selected_examples))
+    messages.append({"role": "user", "content": article})
+
+    def _on_text(text):
+        for index, transition in enumerate(parse_numbered_transitions(text)[:expected]):
+            on_partial(index, transition)
+
+    reply = _request_completion(
+        messages, model, 0.5, TOKENS_PER_TRANSITION * expected + 10, use_cache,
+        stream=stream, on_text=_on_text if on_partial else None
+    )
+    transitions = parse_numbered_transitions(reply)
+    if len(transitions) != expected:
+        logger.warning(f"Batch reply has {len(transitions)} transitions for {expected} markers")
+        return None
+    return transitions
+
+def generate_transitions(pairs, examples, model="gpt-4", max_in_flight=None, use_cache=True,
+                         stream=False, on_partial=None, avoid=None):
+    """
+    Generate the transitions for all paragraph pairs of an article concurrently.
+
+    Every pair is submitted at once to a bounded thread pool, so the wall-clock
+    time is close to the slowest single call instead of the sum of all calls.
+    Results are returned in marker order, ready for rebuild_article_with_transitions.
+    on_partial(index, text) is called from the worker threads as replies arrive.
+    avoid, if given, holds one list of words to avoid per pair.
+    If some requests still fail after retries, raises PartialResultError
+    carrying the transitions that did succeed.
+    """
+    if not pairs:
+        return []
+
+    workers = max(1, min(max_in_flight or MAX_IN_FLIGHT, len(pairs)))
+    ctx = get_script_run_ctx()
+    trace_id = tracing.current_trace_id()
+
+    def _attach_ctx():
+        # Let worker threads use st.* calls of the current session
+        if ctx is not None:
+            add_script_run_ctx(ctx=ctx)
+        tracing.set_trace_id(trace_id)
+
+    with ThreadPoolExecutor(max_workers=workers, initializer=_attach_ctx) as executor:
+        futures = [
+            executor.submit(
+                get_transition_from_gpt, para_a, para_b, examples, model, use_cache, stream,
+                (lambda text, index=index: on_partial(index, text)) if on_partial else None,
+                avoid[index] if avoid else None
+            )
+            for index, (para_a, para_b) in enumerate(pairs)
+        ]
+        transitions = []
+        errors = []
+        for future in futures:
+            try:
+                transitions.append(future.result())
+            except Exception as e:
+                # Whatever failed, keep the transitions that did succeed
+                transitions.append(None)
+                errors.append(e)
+
+    if errors:
+        raise PartialResultError(
+            f"{len(errors)} of {len(pairs)} transitions could not be generated: {errors[0]}",
+            transitions, errors
+        )
+    return transitions
+
+def fill_missing_transitions(parts, transitions, examples, model="gpt-4", use_cache=True,
+                             stream=None, on_partial=None):
+    """
+    Generate only the transitions left as None by a PartialResultError,
+    keeping the others. Raises PartialResultError again if some still fail.
+    """
+    stream = STREAMING if stream is None else stream
+    transitions = list(transitions)
+    missing = [i for i, transition in enumerate(transitions) if transition is None]
+    pairs = list(zip(parts[:-1], parts[1:]))
+    logger.info(f"Generating missing transitions {[i + 1 for i in missing]}")
+    try:
+        generated = generate_transitions(
+            [pairs[i] for i in missing], examples, model, use_cache=use_cache, stream=stream,
+            on_partial=(lambda index, text: on_partial(missing[index], text)) if on_partial else None
+        )
+    except PartialResultError as e:
+        for i, transition in zip(missing, e.partial):
+            transitions[i] = transition
+        raise PartialResultError(str(e), transitions, e.errors)
+    for i, transition in zip(missing, generated):
+        transitions[i] = transition
+    return transitions
+
+@tracing.traced("generate_article")
+def generate_article_transitions(parts, examples, model="gpt-4", batch=True, use_cache=True,
+                                 stream=None, on_partial=None):
+    """
+    Generate the transitions for an article split on TRANSITION markers.
+    In batch mode one request covers the whole article; if its reply cannot be
+    matched to the markers, falls back to concurrent per-pair requests.
+    stream defaults to the API_STREAMING secret; on_partial(index, text)
+    receives transitions as they are generated, for progressive display.
+    """
+    stream = STREAMING if stream is None else stream
+    if batch:
+        try:
+            transitions = get_transitions_batch(parts, examples, model, use_cache, stream, on_partial)
+        except CircuitOpenError:
+            raise
+        except ProxyError as e:
+            # Per-pair requests are smaller and can succeed independently
+            logger.warning(f"Batch request failed: {str(e)}")
+            transitions = None
+        if transitions is not None:
+            return transitions
+        logger.info("Falling back to per-pair transition generation")
+    pairs = list(zip(parts[:-1], parts[1:]))
+    return generate_transitions(pairs, examples, model, use_cache=use_cache, stream=stream, on_partial=on_partial)
+
+@tracing.traced("repair")
+def repair_transitions(parts, transitions, examples, model="gpt-4", max_rounds=None, use_cache=True):
+    """
+    Regenerate only the transitions flagged by validation until the group is
+    compliant or the retry budget is spent. Counters are updated one
+    transition at a time with IncrementalValidator.
+    Each regeneration prompt lists the repeated items and the transitions
+    already rejected for that slot, so it differs from the original prompt and
+    from earlier rounds; its reply is cached under that prompt like any other.
+    Returns the repaired transitions and the remaining violations.
+    """
+    validator = IncrementalValidator(transitions)
+    pairs = list(zip(parts[:-1], parts[1:]))
+    rounds = REPAIR_MAX_ROUNDS if max_rounds is None else max_rounds
+    rejected = {}
+
+    for round_number in range(1, rounds + 1):
+        offending = validator.offending_indices()
+        if not offending:
+            break
+        logger.info(f"Repair round {round_number}: regenerating transitions {[i + 1 for i in offending]}")
+        avoid = []
+        for i in offending:
+            rejected.setdefault(i, [])
+            if validator.transitions[i] not in rejected[i]:
+                rejected[i].append(validator.transitions[i])
+            items = validator.repeated_items(i)
+            if validator.features[i]["enfin"] and i != len(pairs) - 1:
+                items.append("enfin")
+            avoid.append(list(dict.fromkeys(items + rejected[i])))
+        try:
+            replacements = generate_transitions(
+                [pairs[i] for i in offending], examples, model, use_cache=use_cache, avoid=avoid
+            )
+        except PartialResultError as e:
+            # Keep the current transition wherever regeneration failed
+            logger.warning(f"Repair round {round_number}: {str(e)}")
+            replacements = e.partial
+        for i, transition in zip(offending, replacements):
+            if transition is not None:
+                validator.replace(i, transition)
 
-    return data["reply"].strip()
+    return validator.transitions, validator.violations()
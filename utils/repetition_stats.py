@@ -0,0 +1,120 @@
+import glob
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from typing import Iterable, List, Optional, Tuple
+from utils.article_format import article_timestamp, parse_transitions
+from utils.logger import logger
+from utils.settings import get_setting
+from utils.validate_prompt_compliance import tokenize
+
+# Persistent cross-article statistics; counts are kept in daily buckets so
+# time-windowed queries only sum a few rows per term
+STATS_PATH = get_setting("REPETITION_STATS_PATH", os.path.join("outputs", "repetition_stats.sqlite"))
+DAY_SECONDS = 24 * 3600
+
+# Kinds of terms tracked per article
+TRANSITION = "transition"
+OPENER = "opener"
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(STATS_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(STATS_PATH, timeout=10)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS articles ("
+        "article_id TEXT PRIMARY KEY, recorded_at REAL NOT NULL, transition_count INTEGER NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS term_counts ("
+        "kind TEXT NOT NULL, day INTEGER NOT NULL, term TEXT NOT NULL, count INTEGER NOT NULL, "
+        "PRIMARY KEY (kind, day, term)) WITHOUT ROWID"
+    )
+    return conn
+
+def _terms(transitions: Iterable[str]) -> List[Tuple[str, str]]:
+    terms = []
+    for transition in transitions:
+        words = tokenize(transition)
+        if not words:
+            continue
+        terms.append((TRANSITION, " ".join(words)))
+        terms.append((OPENER, words[0]))
+    return terms
+
+def record_article(article_id: str, transitions: List[str], timestamp: Optional[float] = None) -> bool:
+    """
+    Add the transitions of one article to the global statistics.
+    Each article is counted once: recording the same article_id again is a no-op.
+    Returns True if the article was added.
+    """
+    timestamp = time.time() if timestamp is None else timestamp
+    day = int(timestamp // DAY_SECONDS)
+    try:
+        with closing(_connect()) as conn, conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO articles (article_id, recorded_at, transition_count) VALUES (?, ?, ?)",
+                (article_id, timestamp, len(transitions))
+            ).rowcount
+            if not inserted:
+                return False
+            conn.executemany(
+                "INSERT INTO term_counts (kind, day, term, count) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (kind, day, term) DO UPDATE SET count = count + 1",
+                [(kind, day, term) for kind, term in _terms(transitions)]
+            )
+        return True
+    except sqlite3.Error as e:
+        logger.warning(f"Could not record repetition stats for {article_id}: {str(e)}")
+        return False
+
+def _first_day(days: Optional[int]) -> int:
+    # Windows cover today and the days - 1 days before it, in whole day buckets
+    return 0 if days is None else int(time.time() // DAY_SECONDS) - days + 1
+
+def top_terms(kind: str = OPENER, days: Optional[int] = 7, limit: int = 10) -> List[Tuple[str, int]]:
+    """Most frequent terms of a kind over the last `days` days (all time if None)."""
+    first_day = _first_day(days)
+    with closing(_connect()) as conn:
+        return conn.execute(
+            "SELECT term, SUM(count) AS total FROM term_counts "
+            "WHERE kind = ? AND day >= ? GROUP BY term ORDER BY total DESC, term LIMIT ?",
+            (kind, first_day, limit)
+        ).fetchall()
+
+def top_openers(days: Optional[int] = 7, limit: int = 10) -> List[Tuple[str, int]]:
+    """Most frequent first words of transitions, e.g. the overused openers of the week."""
+    return top_terms(OPENER, days, limit)
+
+def top_transitions(days: Optional[int] = 7, limit: int = 10) -> List[Tuple[str, int]]:
+    """Most frequent whole transitions (normalized by tokenize) over the window."""
+    return top_terms(TRANSITION, days, limit)
+
+def article_count(days: Optional[int] = 7) -> int:
+    """Number of articles recorded over the last `days` days (all time if None), same window as top_terms."""
+    since = _first_day(days) * DAY_SECONDS
+    with closing(_connect()) as conn:
+        return conn.execute(
+            "SELECT COUNT(*) FROM articles WHERE recorded_at >= ?", (since,)
+        ).fetchone()[0]
+
+def backfill(directory: str) -> int:
+    """Record every article_*.txt under directory that is not yet in the store. Returns the count added."""
+    added = 0
+    for filepath in sorted(glob.glob(os.path.join(directory, "**", "article_*.txt"), recursive=True)):
+        with open(filepath, 'rb') as f:
+            transitions = parse_transitions(f)
+        if transitions and record_article(
+            os.path.basename(filepath), transitions, article_timestamp(filepath).timestamp()
+        ):
+            added += 1
+    return added
+
+if __name__ == "__main__":
+    # python -m utils.repetition_stats [outputs_dir]
+    directory = sys.argv[1] if len(sys.argv) > 1 else "outputs"
+    print(f"Recorded {backfill(directory)} new articles from {directory}")
+    print("Top openers this week:")
+    for term, count in top_openers():
+        print(f"- {term}: {count}")
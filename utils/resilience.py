@@ -0,0 +1,182 @@
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import requests
+import streamlit as st
+from utils import http_client
+from utils.logger import logger
+
+# Retries of one proxy request on 429/5xx and connection errors or timeouts;
+# each attempt gets the connect/read timeouts of utils.http_client
+MAX_RETRIES = int(st.secrets.get("API_MAX_RETRIES", 4))
+# Full-jitter exponential backoff: sleep a random time up to BACKOFF_BASE * 2**attempt
+BACKOFF_BASE = float(st.secrets.get("API_BACKOFF_BASE", 0.5))
+BACKOFF_MAX = float(st.secrets.get("API_BACKOFF_MAX", 10))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Consecutive failures that open the circuit, and seconds before a trial request
+BREAKER_THRESHOLD = int(st.secrets.get("API_BREAKER_THRESHOLD", 5))
+BREAKER_RESET_SECONDS = float(st.secrets.get("API_BREAKER_RESET", 30))
+
+class ProxyError(Exception):
+    """The proxy failed to answer a request, after retries."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class CircuitOpenError(ProxyError):
+    """
+    The proxy is considered down; the request was not sent. retry_in is 0
+    while another request is already probing whether the proxy is back.
+    """
+
+    def __init__(self, message: str, retry_in: float):
+        super().__init__(message)
+        self.retry_in = retry_in
+
+class PartialResultError(Exception):
+    """
+    Some transitions of an article could not be generated. partial holds the
+    full list in marker order, with None where generation failed, so the
+    transitions that did succeed are not lost.
+    """
+
+    def __init__(self, message: str, partial: List[Optional[str]], errors: List[Exception]):
+        super().__init__(message)
+        self.partial = partial
+        self.errors = errors
+
+    @property
+    def missing(self) -> int:
+        return sum(1 for transition in self.partial if transition is None)
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for
+    `reset_seconds`; then lets one trial call through, which closes the
+    circuit on success or reopens it on failure.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.reset_seconds - time.monotonic()
+            if remaining > 0 or self._trial_in_flight:
+                raise CircuitOpenError(
+                    f"Proxy circuit open after {self.failures} consecutive failures, "
+                    f"retrying in {max(remaining, 0):.0f}s",
+                    max(remaining, 0)
+                )
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("Proxy circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or (self.opened_at is None and self.failures >= self.threshold):
+                logger.warning(f"Proxy circuit opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+# Shared by every request to the proxy in this process
+breaker = CircuitBreaker()
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before retry number attempt + 1, honouring a numeric Retry-After."""
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def _send(url: str, kwargs: Dict) -> Tuple[Optional[requests.Response], Optional[ProxyError], Optional[str]]:
+    """
+    One attempt. Returns (response, None, None) for a final answer, or
+    (None, failure, Retry-After header) when the attempt should be retried.
+    """
+    try:
+        breaker.before_call()
+    except CircuitOpenError as e:
+        # Fail fast while open; only wait for the outcome of a trial request in flight
+        if e.retry_in > 0:
+            raise
+        return None, e, None
+
+    try:
+        response = http_client.post(url, **kwargs)
+    except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+        breaker.record_failure()
+        return None, ProxyError(f"API request failed: {type(e).__name__}: {e}"), None
+    except BaseException:
+        # Any other error still resolves a trial request, or the circuit would stay open
+        breaker.record_failure()
+        raise
+
+    if response.status_code not in RETRY_STATUSES:
+        breaker.record_success()
+        return response, None, None
+    # A 429 means the proxy is up but throttling: retry without tripping the breaker
+    if response.status_code == 429:
+        breaker.record_success()
+    else:
+        breaker.record_failure()
+    response.close()
+    failure = ProxyError(f"API request failed with status code {response.status_code}", response.status_code)
+    return None, failure, response.headers.get("Retry-After")
+
+class RetryBudget:
+    """
+    Retries left for one logical request. Sharing it between the sends of a
+    request (e.g. a stream requested again after breaking) keeps the total
+    number of attempts at MAX_RETRIES + 1.
+    """
+
+    def __init__(self, retries: Optional[int] = None):
+        self.retries = MAX_RETRIES if retries is None else retries
+        self.used = 0
+
+    def spend(self, failure: Exception, span=None, retry_after: Optional[str] = None) -> None:
+        """Wait before the next retry, or raise failure once the retries are spent."""
+        if self.used >= self.retries:
+            raise failure
+        delay = backoff_delay(self.used, retry_after)
+        self.used += 1
+        if span is not None:
+            span.set(retries=self.used)
+        logger.warning(f"{failure}; retry {self.used}/{self.retries} in {delay:.1f}s")
+        time.sleep(delay)
+
+def post_with_retries(url: str, span=None, budget: Optional[RetryBudget] = None, **kwargs) -> requests.Response:
+    """
+    POST through the pooled HTTP session, retrying 429/5xx answers, connection
+    errors, bodies cut off mid-read and timeouts with jittered exponential backoff.
+    Fails fast with CircuitOpenError while the circuit is open and raises
+    ProxyError once the retries of budget (a new one by default) are spent.
+    Other responses, errors included, are returned as is. The retry count is
+    recorded on the tracing span if one is given.
+    """
+    budget = budget or RetryBudget()
+    while True:
+        response, failure, retry_after = _send(url, kwargs)
+        if response is not None:
+            return response
+        budget.spend(failure, span, retry_after)
@@ -0,0 +1,101 @@
+# utils/response_cache.py
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Dict, List, Optional
+import streamlit as st
+from utils.logger import logger
+
+CACHE_PATH = st.secrets.get("RESPONSE_CACHE_PATH", os.path.join("cache", "responses.sqlite"))
+# Entries older than this are treated as misses and purged
+CACHE_TTL_SECONDS = int(st.secrets.get("RESPONSE_CACHE_TTL", 30 * 24 * 3600))
+# Least recently used entries are evicted above this size
+CACHE_MAX_ENTRIES = int(st.secrets.get("RESPONSE_CACHE_MAX_ENTRIES", 20000))
+
+_lock = threading.Lock()
+_initialized = False
+
+os.makedirs(os.path.dirname(CACHE_PATH) or ".", exist_ok=True)
+
+def _connect() -> sqlite3.Connection:
+    global _initialized
+    conn = sqlite3.connect(CACHE_PATH, timeout=10)
+    if not _initialized:
+        with _lock:
+            if not _initialized:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, reply TEXT NOT NULL, "
+                    "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+                conn.commit()
+                _initialized = True
+    return conn
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+def make_key(messages: List[Dict], model: str, temperature: float, max_tokens: int) -> str:
+    """
+    Build a content-addressed cache key from the prompt messages and sampling settings.
+    Whitespace is normalized so cosmetic differences in the input do not miss the cache.
+    """
+    normalized = {
+        "model": model,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "messages": [
+            {"role": m["role"], "content": _normalize(m["content"])}
+            for m in messages
+        ],
+    }
+    blob = json.dumps(normalized, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def get(key: str) -> Optional[str]:
+    """Return the cached reply for key, or None on a miss or an expired entry."""
+    now = time.time()
+    try:
+        with closing(_connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT reply, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            reply, created_at = row
+            if now - created_at > CACHE_TTL_SECONDS:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            return reply
+    except sqlite3.Error as e:
+        logger.warning(f"Response cache read failed: {str(e)}")
+        return None
+
+def put(key: str, reply: str) -> None:
+    """Store a reply and evict the least recently used entries beyond CACHE_MAX_ENTRIES."""
+    now = time.time()
+    try:
+        with closing(_connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, reply, created_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, reply, now, now)
+            )
+            conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - CACHE_TTL_SECONDS,)
+            )
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (CACHE_MAX_ENTRIES,)
+            )
+    except sqlite3.Error as e:
+        logger.warning(f"Response cache write failed: {str(e)}")
@@ -0,0 +1,13 @@
+from typing import Any
+import streamlit as st
+
+def get_setting(key: str, default: Any = None) -> Any:
+    """
+    st.secrets.get for modules also used by the command-line tools: returns
+    default instead of raising when there is no secrets.toml at all.
+    """
+    try:
+        return st.secrets.get(key, default)
+    except FileNotFoundError:
+        # StreamlitSecretNotFoundError subclasses FileNotFoundError
+        return default
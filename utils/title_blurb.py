@@ -1,7 +1,8 @@
 # utils/title_blurb.py
 
-import requests
 import streamlit as st
+from utils import debug_log
+from utils.resilience import ProxyError, post_with_retries
 
 API_TOKEN = st.secrets.get("API_TOKEN")
 API_URL = st.secrets.get("API_URL")
@@ -41,26 +42,23 @@ def generate_title_and_blurb(paragraph: str):
         "Content-Type": "application/json"
     }
 
-    # 🔍 Debug log
-    st.write("🧪 Prompt sent to API:")
-    st.code(prompt_text)
+    debug_log.record("title_request", prompt=prompt_text)
 
-    response = requests.post(API_URL, headers=headers, json={"prompt": prompt_text})
-
-    # 🔍 Debug log
-    st.write("🧪 Raw API response:")
-    st.code(response.text)
+    # Retried with backoff on 429/5xx; fails fast while the proxy circuit is open
+    response = post_with_retries(API_URL, headers=headers, json={"prompt": prompt_text})
 
     if response.status_code != 200:
-        raise Exception(
+        raise ProxyError(
             f"API request failed with status code {response.status_code}\n"
-            f"Response content:\n{response.text}"
+            f"Response content:\n{response.text}",
+            response.status_code
         )
 
     response_data = response.json()
+    debug_log.record("title_response", data=response_data)
 
     if response_data.get("status") != "success":
-        raise Exception(
+        raise ProxyError(
             f"API request failed:\nStatus: {response_data.get('status')}\n"
             f"Error: {response_data.get('error', 'Unknown error')}\n"
             f"Full response:\n{response.text}"
@@ -0,0 +1,223 @@
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+from utils.settings import get_setting
+
+# Every finished span is appended here as one JSON line
+TRACE_PATH = get_setting("TRACE_PATH", os.path.join("logs", "traces.jsonl"))
+# Prometheus text exposition file written by write_prometheus
+METRICS_PATH = get_setting("METRICS_PATH", os.path.join("logs", "metrics.prom"))
+TRACE_TO_FILE = str(get_setting("TRACE_TO_FILE", True)).lower() not in ("0", "false", "no")
+# Durations kept per stage for the p50/p95 estimates
+STAGE_WINDOW = int(get_setting("TRACE_STAGE_WINDOW", 1000))
+
+# Span attributes that are summed per stage; others are only exported to JSONL
+SUMMED_ATTRS = (
+    "prompt_chars", "completion_chars", "prompt_tokens", "completion_tokens", "cached_tokens",
+    "cache_hit", "retries", "items"
+)
+
+_trace_id: contextvars.ContextVar = contextvars.ContextVar("trace_id", default=None)
+_lock = threading.Lock()
+
+class StageStats:
+    """Running totals of one stage, with a bounded window of durations for quantiles."""
+
+    def __init__(self, window: int = STAGE_WINDOW):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.durations = deque(maxlen=window)
+        self.totals = Counter()
+
+    def add(self, record: Dict) -> None:
+        duration = record["duration_ms"] / 1000
+        self.count += 1
+        self.seconds += duration
+        self.durations.append(duration)
+        if "error" in record:
+            self.errors += 1
+        for attr in SUMMED_ATTRS:
+            value = record.get(attr)
+            if value is not None:
+                self.totals[attr] += int(value) if isinstance(value, bool) else value
+
+    def quantile(self, q: float) -> float:
+        if not self.durations:
+            return 0.0
+        ordered = sorted(self.durations)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_s": round(self.seconds, 3),
+            "p50_ms": round(self.quantile(0.5) * 1000, 1),
+            "p95_ms": round(self.quantile(0.95) * 1000, 1),
+            **self.totals
+        }
+
+_stages: Dict[str, StageStats] = defaultdict(StageStats)
+# Recent span records, used to break a single trace down by stage
+_recent: deque = deque(maxlen=5000)
+
+class Span:
+    """A timed stage; attributes set on it are exported with its duration."""
+
+    def __init__(self, stage: str, attrs: Dict):
+        self.stage = stage
+        self.attrs = attrs
+        self.span_id = uuid.uuid4().hex[:16]
+        self.trace_id = _trace_id.get()
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+def _write_record(record: Dict) -> None:
+    try:
+        os.makedirs(os.path.dirname(TRACE_PATH) or ".", exist_ok=True)
+        with open(TRACE_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    except OSError:
+        # Tracing must never break the pipeline
+        pass
+
+def _finish(span: Span, duration: float) -> None:
+    record = {
+        "ts": round(time.time(), 3),
+        "trace_id": span.trace_id,
+        "span_id": span.span_id,
+        "stage": span.stage,
+        "duration_ms": round(duration * 1000, 2),
+        **{key: value for key, value in span.attrs.items() if value is not None}
+    }
+    with _lock:
+        _stages[span.stage].add(record)
+        _recent.append(record)
+        if TRACE_TO_FILE:
+            _write_record(record)
+
+@contextmanager
+def span(stage: str, **attrs) -> Iterator[Span]:
+    """Time a stage of the pipeline. Exceptions are recorded on the span and re-raised."""
+    current = Span(stage, attrs)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.set(error=type(e).__name__)
+        raise
+    finally:
+        _finish(current, time.perf_counter() - start)
+
+def traced(stage: str):
+    """Decorator running the function inside a span named stage."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def trace(name: str = "article") -> Iterator[str]:
+    """Give every span in the block one trace id (e.g. one article) and time the block itself."""
+    token = _trace_id.set(uuid.uuid4().hex[:16])
+    try:
+        with span(name):
+            yield _trace_id.get()
+    finally:
+        _trace_id.reset(token)
+
+def current_trace_id() -> Optional[str]:
+    return _trace_id.get()
+
+def set_trace_id(trace_id: Optional[str]) -> None:
+    """Attach a worker thread to the trace of the thread that submitted its work."""
+    _trace_id.set(trace_id)
+
+def stage_stats() -> Dict[str, Dict]:
+    """Count, total seconds, p50/p95 and summed attributes of every stage seen by this process."""
+    with _lock:
+        return {stage: stats.summary() for stage, stats in sorted(_stages.items())}
+
+def trace_records(trace_id: str) -> List[Dict]:
+    """The recent span records of one trace."""
+    with _lock:
+        return [r for r in _recent if r["trace_id"] == trace_id]
+
+def trace_breakdown(trace_id: str) -> Dict[str, Dict]:
+    """Seconds and span count per stage for one trace, from the recent spans."""
+    breakdown: Dict[str, Dict] = {}
+    for record in trace_records(trace_id):
+        entry = breakdown.setdefault(record["stage"], {"count": 0, "seconds": 0.0})
+        entry["count"] += 1
+        entry["seconds"] = round(entry["seconds"] + record["duration_ms"] / 1000, 3)
+    return breakdown
+
+def aggregate(records: Iterable[Dict]) -> Dict[str, StageStats]:
+    """Build per-stage statistics from span records, e.g. read back from TRACE_PATH."""
+    stages: Dict[str, StageStats] = defaultdict(StageStats)
+    for record in records:
+        stages[record["stage"]].add(record)
+    return stages
+
+def read_records(path: str = TRACE_PATH) -> Iterator[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def prometheus_text(stages: Optional[Dict[str, StageStats]] = None) -> str:
+    """Render stage statistics in the Prometheus text exposition format."""
+    with _lock:
+        stages = dict(_stages if stages is None else stages)
+        lines = [
+            "# HELP transitions_stage_duration_seconds Wall time of each pipeline stage",
+            "# TYPE transitions_stage_duration_seconds summary"
+        ]
+        for stage, stats in sorted(stages.items()):
+            for q in (0.5, 0.95):
+                lines.append(
+                    f'transitions_stage_duration_seconds{{stage="{stage}",quantile="{q}"}} {stats.quantile(q):.6f}'
+                )
+            lines.append(f'transitions_stage_duration_seconds_sum{{stage="{stage}"}} {stats.seconds:.6f}')
+            lines.append(f'transitions_stage_duration_seconds_count{{stage="{stage}"}} {stats.count}')
+        lines.append("# TYPE transitions_stage_errors_total counter")
+        for stage, stats in sorted(stages.items()):
+            lines.append(f'transitions_stage_errors_total{{stage="{stage}"}} {stats.errors}')
+        for attr in SUMMED_ATTRS:
+            lines.append(f"# TYPE transitions_{attr}_total counter")
+            for stage, stats in sorted(stages.items()):
+                if attr in stats.totals:
+                    lines.append(f'transitions_{attr}_total{{stage="{stage}"}} {stats.totals[attr]}')
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path: str = METRICS_PATH, stages: Optional[Dict[str, StageStats]] = None) -> None:
+    """Write the metrics file atomically so a scraper never reads a partial file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(prometheus_text(stages))
+    os.replace(tmp_path, path)
+
+if __name__ == "__main__":
+    # python -m utils.tracing [traces.jsonl]: per-stage latency report over all recorded spans
+    source = sys.argv[1] if len(sys.argv) > 1 else TRACE_PATH
+    stages = aggregate(read_records(source))
+    print(f"{'stage':<22}{'count':>8}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for stage, stats in sorted(stages.items(), key=lambda item: -item[1].seconds):
+        summary = stats.summary()
+        print(f"{stage:<22}{summary['count']:>8}{summary['total_s']:>10}{summary['p50_ms']:>10}{summary['p95_ms']:>10}")
+    write_prometheus(METRICS_PATH, stages)
+    print(f"Metrics written to {METRICS_PATH}")
@@ -0,0 +1,202 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import List, Optional, Tuple
+from googleapiclient.http import MediaFileUpload
+import streamlit as st
+from utils.logger import logger
+from utils.drive_service import get_drive_service
+from utils import tracing
+
+# Durable journal of pending uploads; survives restarts so nothing is lost
+JOURNAL_PATH = os.path.join("outputs", "upload_queue.sqlite")
+SCOPES = ['https://www.googleapis.com/auth/drive']
+# Max uploads drained per worker wake-up
+BATCH_SIZE = 10
+# Delay before retrying a failed upload, doubled per attempt up to MAX_RETRY_DELAY
+RETRY_DELAY = 5
+MAX_RETRY_DELAY = 600
+# Jobs still failing after this many attempts are marked 'failed' and no longer retried
+MAX_ATTEMPTS = 8
+
+_wakeup = threading.Event()
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(JOURNAL_PATH), exist_ok=True)
+    conn = sqlite3.connect(JOURNAL_PATH, timeout=10)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS uploads ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, file_path TEXT NOT NULL, file_name TEXT NOT NULL, "
+        "status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+        "next_attempt_at REAL NOT NULL DEFAULT 0, last_error TEXT, drive_file_id TEXT, "
+        "created_at REAL NOT NULL)"
+    )
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    return conn
+
+def _get_meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def enqueue_upload(file_path: str, file_name: str) -> int:
+    """Record an upload in the journal and wake the background worker. Returns the job id."""
+    with closing(_connect()) as conn, conn:
+        job_id = conn.execute(
+            "INSERT INTO uploads (file_path, file_name, created_at) VALUES (?, ?, ?)",
+            (file_path, file_name, time.time())
+        ).lastrowid
+    logger.info(f"Queued {file_name} for upload to Google Drive (job {job_id})")
+    start_worker()
+    _wakeup.set()
+    return job_id
+
+def pending_count() -> int:
+    with closing(_connect()) as conn:
+        return conn.execute("SELECT COUNT(*) FROM uploads WHERE status = 'pending'").fetchone()[0]
+
+def _ensure_folder_permission(service, conn: sqlite3.Connection, folder_id: str) -> None:
+    # The folder only needs to be shared once; later uploads skip the call
+    if _get_meta(conn, f"folder_permission:{folder_id}"):
+        return
+    service.permissions().create(
+        fileId=folder_id,
+        body={'type': 'anyone', 'role': 'reader'},
+        fields='id'
+    ).execute()
+    conn.execute(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+        (f"folder_permission:{folder_id}", "1")
+    )
+    logger.info(f"Set folder permissions for folder ID: {folder_id}")
+
+def _record_failure(conn: sqlite3.Connection, job_id: int, attempts: int, error: str,
+                    permanent: bool = False) -> None:
+    """Schedule the retry of a failed job, or give up on it once its attempts are spent."""
+    if permanent or attempts + 1 >= MAX_ATTEMPTS:
+        logger.error(f"Giving up on upload job {job_id} after {attempts + 1} attempts: {error}")
+        conn.execute(
+            "UPDATE uploads SET status = 'failed', attempts = attempts + 1, last_error = ? WHERE id = ?",
+            (error, job_id)
+        )
+        return
+    delay = min(RETRY_DELAY * 2 ** attempts, MAX_RETRY_DELAY)
+    conn.execute(
+        "UPDATE uploads SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+        (time.time() + delay, error, job_id)
+    )
+
+def _upload_batch(jobs: List[Tuple[int, str, str, int, Optional[str]]]) -> None:
+    service = get_drive_service(SCOPES)
+    folder_id = st.secrets.get("gdrive_folder_id")
+    if not folder_id:
+        raise ValueError("No folder ID found in Streamlit secrets")
+
+    with closing(_connect()) as conn, conn:
+        _ensure_folder_permission(service, conn, folder_id)
+
+    # Jobs whose file was uploaded on an earlier attempt only need their permission
+    uploaded = [(job_id, attempts, drive_file_id) for job_id, _, _, attempts, drive_file_id in jobs if drive_file_id]
+    for job_id, file_path, file_name, attempts, drive_file_id in jobs:
+        if drive_file_id:
+            continue
+        try:
+            if not os.path.exists(file_path):
+                # Retrying cannot bring the file back
+                with closing(_connect()) as conn, conn:
+                    _record_failure(conn, job_id, attempts, f"File not found: {file_path}", permanent=True)
+                continue
+            with tracing.span("drive_upload", file_name=file_name, retries=attempts):
+                file = service.files().create(
+                    body={'name': file_name, 'parents': [folder_id]},
+                    media_body=MediaFileUpload(file_path, resumable=True),
+                    fields='id, webViewLink',
+                    supportsAllDrives=True
+                ).execute()
+            # Keep the file id so a failed permission request does not upload the file again
+            with closing(_connect()) as conn, conn:
+                conn.execute("UPDATE uploads SET drive_file_id = ? WHERE id = ?", (file.get('id'), job_id))
+            uploaded.append((job_id, attempts, file.get('id')))
+            logger.info(f"Successfully uploaded {file_name} to Google Drive, file ID: {file.get('id')}")
+        except Exception as e:
+            logger.error(f"Failed to upload {file_name} (attempt {attempts + 1}): {str(e)}")
+            with closing(_connect()) as conn, conn:
+                _record_failure(conn, job_id, attempts, str(e))
+
+    if not uploaded:
+        return
+
+    # Share all uploaded files with a single batched request; each part reports its own error
+    failed = {}
+
+    def _on_permission(request_id, response, exception):
+        if exception is not None:
+            failed[int(request_id)] = exception
+
+    batch = service.new_batch_http_request()
+    for job_id, _, drive_file_id in uploaded:
+        batch.add(service.permissions().create(
+            fileId=drive_file_id,
+            body={'type': 'anyone', 'role': 'reader'},
+            fields='id'
+        ), callback=_on_permission, request_id=str(job_id))
+    try:
+        with tracing.span("drive_permissions", items=len(uploaded)):
+            batch.execute()
+    except Exception as e:
+        failed = {job_id: e for job_id, _, _ in uploaded}
+
+    with closing(_connect()) as conn, conn:
+        for job_id, attempts, _ in uploaded:
+            if job_id in failed:
+                # Left pending with its file id: the next attempt only retries the permission
+                logger.warning(f"Failed to set file permissions (job {job_id}): {str(failed[job_id])}")
+                _record_failure(conn, job_id, attempts, f"Permission not set: {failed[job_id]}")
+            else:
+                conn.execute("UPDATE uploads SET status = 'done', last_error = NULL WHERE id = ?", (job_id,))
+
+def _drain() -> float:
+    """Upload every due job, returning the seconds until the next retry is due (0 if none)."""
+    while True:
+        now = time.time()
+        with closing(_connect()) as conn:
+            jobs = conn.execute(
+                "SELECT id, file_path, file_name, attempts, drive_file_id FROM uploads "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (now, BATCH_SIZE)
+            ).fetchall()
+            next_due = conn.execute(
+                "SELECT MIN(next_attempt_at) FROM uploads WHERE status = 'pending' AND next_attempt_at > ?",
+                (now,)
+            ).fetchone()[0]
+        if not jobs:
+            return max(0.0, next_due - now) if next_due else 0.0
+        try:
+            _upload_batch(jobs)
+        except Exception as e:
+            # Credentials or configuration problem: back off the whole batch
+            logger.error(f"Error uploading to Google Drive: {str(e)}")
+            with closing(_connect()) as conn, conn:
+                for job_id, _, _, attempts, _ in jobs:
+                    _record_failure(conn, job_id, attempts, str(e))
+
+def _run() -> None:
+    while True:
+        try:
+            wait = _drain()
+        except Exception as e:
+            logger.error(f"Upload queue worker error: {str(e)}")
+            wait = RETRY_DELAY
+        _wakeup.wait(timeout=wait or None)
+        _wakeup.clear()
+
+def start_worker() -> None:
+    """Start the background upload worker; pending jobs from earlier runs are retried."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="gdrive-upload-queue", daemon=True)
+            _worker.start()
@@ -1,10 +1,12 @@
-from typing import List, Dict, Set, Tuple
+from typing import Iterable, List, Dict, Set, Tuple
 import string
 from collections import Counter
 import os
 import streamlit as st
 import re
 from utils.logger import logger
+from utils.pattern_matcher import PatternMatcher
+from utils.tracing import traced
 
 def load_stopwords() -> Set[str]:
     stopwords_file = os.path.join(os.path.dirname(__file__), 'french_stopwords.txt')
@@ -20,7 +22,23 @@ def load_stylistic_expressions(filepath: str = 'stylistic_patterns.txt') -> Set[
 
 # Load stylistic patterns from file
 STYLISTIC_EXPRESSIONS: Set[str] = load_stylistic_expressions()
-print(STYLISTIC_EXPRESSIONS, "STYLISTIC_EXPRESSIONS🤞🤞🤞🤞")
+logger.info(f"Loaded {len(STYLISTIC_EXPRESSIONS)} stylistic expressions")
+
+# Flexible patterns that may appear at most once per transition group
+FLEXIBLE_PATTERNS: List[str] = [
+    r'(sur|dans|par) un autre \w+',
+    r'(sur|dans|par) la même \w+',
+    r'(sur|dans|par) le même \w+',
+    r'dans l\'actualité \w+',
+    r'pour (terminer|conclure|finir)',
+    r'(signalons|sachez|nous) \w+'
+]
+_FLEXIBLE_REGEXES = [re.compile(pattern) for pattern in FLEXIBLE_PATTERNS]
+
+_STYLISTIC_ORDER: Dict[str, int] = {expr: i for i, expr in enumerate(STYLISTIC_EXPRESSIONS)}
+
+# Translation table for tokenize: apostrophes split words, punctuation is dropped
+_TOKEN_TABLE = str.maketrans({c: (" " if c == "'" else None) for c in string.punctuation})
 
 def tokenize(text: str) -> List[str]:
     """
@@ -32,16 +50,11 @@ def tokenize(text: str) -> List[str]:
     Returns:
         List[str]: List of lowercase words, stripped of punctuation
     """
-    # Replace apostrophes with spaces to split words properly
-    text = text.replace("'", " ")
+    # Apostrophes become spaces and other punctuation is removed in one pass
+    cleaned_text = text.translate(_TOKEN_TABLE).lower()
     
-    # Remove punctuation and convert to lowercase
-    translator = str.maketrans('', '', string.punctuation)
-    cleaned_text = text.translate(translator).lower()
-    
-    # Split into words and filter out empty strings
-    words = [word.strip() for word in cleaned_text.split()]
-    return [word for word in words if word]
+    # split() already drops empty strings and surrounding whitespace
+    return cleaned_text.split()
 
 def extract_ngrams(words: List[str], n: int) -> List[str]:
     """
@@ -56,6 +69,21 @@ def extract_ngrams(words: List[str], n: int) -> List[str]:
     """
     return [' '.join(words[i:i+n]) for i in range(len(words)-n+1)]
 
+# Token-level automaton over the stylistic expressions, whatever their length
+STYLISTIC_MATCHER = PatternMatcher(STYLISTIC_EXPRESSIONS, tokenize)
+
+def find_stylistic_patterns(transition: str) -> List[Tuple[str, int]]:
+    """
+    Find every stylistic expression in a transition.
+    
+    Args:
+        transition (str): The transition phrase
+        
+    Returns:
+        List[Tuple[str, int]]: (expression, token position) for each occurrence
+    """
+    return STYLISTIC_MATCHER.find(tokenize(transition))
+
 def check_stylistic_patterns(transitions: List[str]) -> List[str]:
     """
     Check for repetitive stylistic patterns in transitions.
@@ -68,17 +96,14 @@ def check_stylistic_patterns(transitions: List[str]) -> List[str]:
     """
     violations = []
     
-    # Extract bigrams and trigrams from all transitions
-    all_ngrams = []
+    # Count every occurrence of every stylistic expression
+    pattern_counts = Counter()
     for transition in transitions:
-        words = tokenize(transition)
-        all_ngrams.extend(extract_ngrams(words, 2))  # bigrams
-        all_ngrams.extend(extract_ngrams(words, 3))  # trigrams
+        pattern_counts.update(expr for expr, _ in find_stylistic_patterns(transition))
     
     # Check for repeated stylistic expressions
-    ngram_counts = Counter(all_ngrams)
     for expr in STYLISTIC_EXPRESSIONS:
-        if ngram_counts[expr] > 1:
+        if pattern_counts[expr] > 1:
             violations.append(expr)
     
     return violations
@@ -95,21 +120,11 @@ def check_flexible_patterns(transitions: List[str]) -> List[str]:
     """
     violations = []
     
-    # Define flexible patterns
-    patterns = [
-        r'(sur|dans|par) un autre \w+',
-        r'(sur|dans|par) la même \w+',
-        r'(sur|dans|par) le même \w+',
-        r'dans l\'actualité \w+',
-        r'pour (terminer|conclure|finir)',
-        r'(signalons|sachez|nous) \w+'
-    ]
-    
     # Check each transition against patterns
-    for pattern in patterns:
+    for pattern, regex in zip(FLEXIBLE_PATTERNS, _FLEXIBLE_REGEXES):
         matches = []
         for transition in transitions:
-            if re.search(pattern, transition.lower()):
+            if regex.search(transition.lower()):
                 matches.append(transition)
         if len(matches) > 1:
             violations.append(pattern)
@@ -119,6 +134,8 @@ def check_flexible_patterns(transitions: List[str]) -> List[str]:
 def check_transition_group(transitions: List[str]) -> Dict:
     """
     Validates a group of transitions for repetition and 'enfin' placement.
+    Each transition is tokenized once and every check runs off those tokens;
+    the result is identical to running the individual checks one after another.
     
     Args:
         transitions (List[str]): List of transition phrases
@@ -127,69 +144,148 @@ def check_transition_group(transitions: List[str]) -> Dict:
         Dict: Dictionary containing violation information
     """
     violations = {}
-    
-    # Check for word repetition at the beginning of phrases (including stopwords)
-    first_words = []
-    for transition in transitions:
-        words = tokenize(transition)
-        if words:  # If there are any words
-            first_words.append(words[0])  # Get the first word
-    
-    # Find repeated first words
-    first_word_counts = Counter(first_words)
-    repeated_first_words = [word for word, count in first_word_counts.items() if count > 1]
-    if repeated_first_words:
-        violations["repetition"] = repeated_first_words
-    
-    # Check for content-bearing word repetition in mid-sentence (excluding stopwords)
-    all_content_words = []
-    for transition in transitions:
-        words = tokenize(transition)
-        if len(words) > 1:  # Only check mid-sentence words
-            # Filter out stopwords and empty strings
-            meaningful_words = [w for w in words[1:] if w and w not in FRENCH_STOPWORDS]
-            all_content_words.extend(meaningful_words)
-    
-    # Find repeated content-bearing words
-    content_word_counts = Counter(all_content_words)
-    repeated_content_words = [word for word, count in content_word_counts.items() if count > 1]
-    if repeated_content_words:
-        if "repetition" in violations:
-            violations["repetition"].extend(repeated_content_words)
-        else:
-            violations["repetition"] = repeated_content_words
-    
-    # Check for stylistic pattern repetition
-    stylistic_violations = check_stylistic_patterns(transitions)
-    if stylistic_violations:
-        if "repetition" in violations:
-            violations["repetition"].extend(stylistic_violations)
-        else:
-            violations["repetition"] = stylistic_violations
-    
-    # Check for flexible pattern matches
-    flexible_violations = check_flexible_patterns(transitions)
-    if flexible_violations:
-        if "repetition" in violations:
-            violations["repetition"].extend(flexible_violations)
-        else:
-            violations["repetition"] = flexible_violations
+    tokenized = [tokenize(transition) for transition in transitions]
+    
+    first_word_counts = Counter()
+    content_word_counts = Counter()
+    stylistic_counts = Counter()
+    for words in tokenized:
+        if not words:
+            continue
+        # Word repetition at the beginning of phrases (including stopwords)
+        first_word_counts[words[0]] += 1
+        # Content-bearing word repetition in mid-sentence (excluding stopwords)
+        content_word_counts.update(w for w in words[1:] if w not in FRENCH_STOPWORDS)
+        # Stylistic expressions of any length, found in one scan
+        stylistic_counts.update(expr for expr, _ in STYLISTIC_MATCHER.find(words))
+    
+    repetition = [word for word, count in first_word_counts.items() if count > 1]
+    repetition.extend(word for word, count in content_word_counts.items() if count > 1)
+    # Keep the STYLISTIC_EXPRESSIONS iteration order used by check_stylistic_patterns
+    repetition.extend(sorted(
+        (expr for expr, count in stylistic_counts.items() if count > 1),
+        key=_STYLISTIC_ORDER.__getitem__
+    ))
+    
+    # Flexible patterns: stop scanning a pattern as soon as it matches twice
+    lowered = [transition.lower() for transition in transitions]
+    for pattern, regex in zip(FLEXIBLE_PATTERNS, _FLEXIBLE_REGEXES):
+        matches = 0
+        for text in lowered:
+            if regex.search(text):
+                matches += 1
+                if matches > 1:
+                    repetition.append(pattern)
+                    break
+    
+    if repetition:
+        violations["repetition"] = repetition
     
     # Check 'enfin' placement
-    for i, transition in enumerate(transitions):
-        words = tokenize(transition)
-        if "enfin" in words and i != len(transitions) - 1:
-            violations["enfin_misplaced"] = True
-            break
+    last = len(transitions) - 1
+    if any("enfin" in words for words in tokenized[:last]):
+        violations["enfin_misplaced"] = True
     
     return violations
 
-def validate_batch(batch_outputs: List[Tuple[str, List[str]]]) -> Dict:
+class IncrementalValidator:
+    """
+    Keeps the repetition counters of a transition group so that replacing one
+    transition only removes its old features and adds the new ones, instead of
+    re-validating the whole group.
+    Reports the same violation categories as check_transition_group.
+    """
+
+    def __init__(self, transitions: List[str]):
+        self.transitions = list(transitions)
+        self.features = [self._extract(t) for t in self.transitions]
+        self.first_words = Counter()
+        self.content_words = Counter()
+        self.stylistic = Counter()
+        self.flexible = Counter()
+        for features in self.features:
+            self._apply(features, 1)
+
+    @staticmethod
+    def _extract(transition: str) -> Dict:
+        words = tokenize(transition)
+        lowered = transition.lower()
+        return {
+            "first_word": words[0] if words else None,
+            "content_words": [w for w in words[1:] if w not in FRENCH_STOPWORDS] if len(words) > 1 else [],
+            "stylistic": [expr for expr, _ in STYLISTIC_MATCHER.find(words)],
+            "flexible": [p for p, regex in zip(FLEXIBLE_PATTERNS, _FLEXIBLE_REGEXES) if regex.search(lowered)],
+            "enfin": "enfin" in words,
+        }
+
+    def _apply(self, features: Dict, sign: int) -> None:
+        if features["first_word"] is not None:
+            self.first_words[features["first_word"]] += sign
+        for word in features["content_words"]:
+            self.content_words[word] += sign
+        for ngram in features["stylistic"]:
+            self.stylistic[ngram] += sign
+        for pattern in features["flexible"]:
+            self.flexible[pattern] += sign
+
+    def replace(self, index: int, transition: str) -> None:
+        """Swap the transition at index and update the counters incrementally."""
+        self._apply(self.features[index], -1)
+        self.transitions[index] = transition
+        self.features[index] = self._extract(transition)
+        self._apply(self.features[index], 1)
+
+    def repeated_items(self, index: int) -> List[str]:
+        """Words, expressions and patterns of the transition at index also used by another one."""
+        features = self.features[index]
+        repeated = []
+        if features["first_word"] is not None and self.first_words[features["first_word"]] > 1:
+            repeated.append(features["first_word"])
+        repeated.extend(w for w in features["content_words"] if self.content_words[w] > 1)
+        repeated.extend(ng for ng in features["stylistic"] if self.stylistic[ng] > 1)
+        repeated.extend(p for p in features["flexible"] if self.flexible[p] > 1)
+        return repeated
+
+    def offending_indices(self) -> List[int]:
+        """
+        Indices of the transitions to regenerate: every transition sharing a
+        repeated item with an earlier one, and any 'enfin' before the last one.
+        """
+        seen = set()
+        offending = []
+        last = len(self.transitions) - 1
+        for i in range(len(self.transitions)):
+            flagged = self.features[i]["enfin"] and i != last
+            for item in self.repeated_items(i):
+                flagged = flagged or item in seen
+                seen.add(item)
+            if flagged:
+                offending.append(i)
+        return offending
+
+    def violations(self) -> Dict:
+        """Current violations, in the format returned by check_transition_group."""
+        violations = {}
+        repetition = [w for w, c in self.first_words.items() if c > 1]
+        repetition += [w for w, c in self.content_words.items() if c > 1]
+        repetition += [ng for ng, c in self.stylistic.items() if c > 1]
+        repetition += [p for p in FLEXIBLE_PATTERNS if self.flexible[p] > 1]
+        if repetition:
+            violations["repetition"] = repetition
+        last = len(self.transitions) - 1
+        if any(f["enfin"] and i != last for i, f in enumerate(self.features)):
+            violations["enfin_misplaced"] = True
+        return violations
+
+@traced("validate_batch")
+def validate_batch(batch_outputs: Iterable[Tuple[str, List[str]]]) -> Dict:
     """
     Validates a batch of transition outputs for compliance with French transition rules.
+    Outputs are validated as they are consumed, so a generator can feed results in
+    while it is still producing them.
     
     Args:
-        batch_outputs (List[Tuple[str, List[str]]]): List of tuples containing (filename, transitions)
+        batch_outputs (Iterable[Tuple[str, List[str]]]): (filename, transitions) tuples
         
     Returns:
         Dict: Summary of violations and per-output breakdown
@@ -220,7 +316,7 @@ def validate_batch(batch_outputs: List[Tuple[str, List[str]]]) -> Dict:
     total_violations = len(repetition_affected_outputs | enfin_misplaced_outputs)
     
     return {
-        "total_outputs": len(batch_outputs),
+        "total_outputs": len(details),
         "outputs_with_violations": total_violations,
         "violations_summary": {
             "repetition": {
@@ -0,0 +1,94 @@
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+
+# Each token id takes BITS bits of a packed int64 n-gram key, so keys hold up
+# to MAX_ORDER tokens and the vocabulary up to 2**BITS - 1 distinct tokens.
+# Longer n-grams are keyed by their row of n token ids instead.
+BITS = 21
+MAX_ORDER = 3
+_MASK = (1 << BITS) - 1
+
+class Vocabulary:
+    """Interns tokens as small ints; id 0 is reserved so packed keys never collide."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.tokens: List[str] = [""]
+
+    def __len__(self) -> int:
+        return len(self.tokens) - 1
+
+    def intern(self, words: Iterable[str]) -> List[int]:
+        """Map tokens to ids, adding unseen tokens to the vocabulary."""
+        ids = []
+        for word in words:
+            token_id = self.ids.get(word)
+            if token_id is None:
+                token_id = len(self.tokens)
+                if token_id > _MASK:
+                    raise OverflowError(f"Vocabulary exceeds {_MASK} tokens")
+                self.ids[word] = token_id
+                self.tokens.append(word)
+            ids.append(token_id)
+        return ids
+
+    def encode(self, words: Iterable[str]) -> np.ndarray:
+        """Token id array of a list of tokens."""
+        return np.array(self.intern(words), dtype=np.int64)
+
+    def decode_key(self, key, n: int) -> str:
+        """Turn a packed n-gram key, or a row of token ids, back into its space-joined string."""
+        if n > MAX_ORDER:
+            return " ".join(self.tokens[token_id] for token_id in key)
+        words = []
+        for shift in range(BITS * (n - 1), -1, -BITS):
+            words.append(self.tokens[(int(key) >> shift) & _MASK])
+        return " ".join(words)
+
+def ngram_keys(ids: np.ndarray, n: int, lengths: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Packed int64 keys of the n-grams of a token id array, in order, with the
+    position of the first token of each n-gram. When ids is the concatenation
+    of several phrases, pass their lengths so n-grams never span two phrases.
+    Above MAX_ORDER the n ids do not fit in an int64, so each key is a row of
+    a (count, n) array instead.
+    """
+    total = len(ids)
+    if total < n:
+        shape = (0, n) if n > MAX_ORDER else 0
+        return np.empty(shape, dtype=np.int64), np.empty(0, dtype=np.int64)
+    if n > MAX_ORDER:
+        keys = np.stack([ids[offset:total - n + 1 + offset] for offset in range(n)], axis=1)
+    else:
+        keys = ids[:total - n + 1].copy()
+        for offset in range(1, n):
+            keys = (keys << BITS) | ids[offset:total - n + 1 + offset]
+    positions = np.arange(total - n + 1)
+    if lengths is not None:
+        # Tokens left in the phrase from each position, including itself
+        ends = np.repeat(np.cumsum(lengths), lengths)[:total - n + 1]
+        valid = ends - positions >= n
+        keys, positions = keys[valid], positions[valid]
+    return keys, positions
+
+def count_keys(keys: np.ndarray, groups: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Count packed keys, or rows of token ids, with np.unique. When the group
+    index of each key is given, also returns in how many distinct groups each
+    key appears.
+    Returns (unique keys, counts, document frequencies).
+    """
+    if keys.ndim > 1:
+        unique, counts = np.unique(keys, axis=0, return_counts=True)
+        if groups is None or len(keys) == 0:
+            return unique, counts, counts.copy()
+        pairs = np.unique(np.column_stack([keys, groups]), axis=0)
+        _, df = np.unique(pairs[:, :-1], axis=0, return_counts=True)
+        return unique, counts, df
+    unique, counts = np.unique(keys, return_counts=True)
+    if groups is None or len(keys) == 0:
+        return unique, counts, counts.copy()
+    pairs = np.unique(np.stack([keys, groups]), axis=1)
+    # Each distinct (key, group) pair counts once; its sorted distinct keys equal unique
+    _, df = np.unique(pairs[0], return_counts=True)
+    return unique, counts, df
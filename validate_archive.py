@@ -0,0 +1,79 @@
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from utils.article_format import article_timestamp, parse_transitions
+from utils.validate_prompt_compliance import check_transition_group
+
+def read_article_transitions(filepath: str) -> List[str]:
+    """Read the numbered transitions listed under the 'Transitions générées:' header."""
+    with open(filepath, 'rb') as f:
+        return parse_transitions(f)
+
+def validate_file(filepath: str) -> Dict:
+    """Validate one article file; errors are reported in the record instead of raised."""
+    try:
+        transitions = read_article_transitions(filepath)
+        return {
+            "output_id": os.path.basename(filepath),
+            "path": filepath,
+            "transitions": transitions,
+            "violations": check_transition_group(transitions) if transitions else {}
+        }
+    except Exception as e:
+        return {"output_id": os.path.basename(filepath), "path": filepath, "error": str(e)}
+
+def find_articles(directory: str, since: Optional[datetime] = None) -> List[str]:
+    files = sorted(glob.glob(os.path.join(directory, "**", "article_*.txt"), recursive=True))
+    if since:
+        files = [f for f in files if article_timestamp(f) >= since]
+    return files
+
+def parse_since(value: str) -> datetime:
+    for fmt in ("%Y-%m-%d", "%Y%m%d", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"Invalid date for --since: {value}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Validate a directory of article_*.txt files and stream JSONL results."
+    )
+    parser.add_argument("directory", help="Directory containing article_*.txt files (searched recursively)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--since", type=parse_since,
+                        help="Only validate articles generated on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--output", help="Write JSONL to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    files = find_articles(args.directory, args.since)
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    with_violations = errors = 0
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            chunksize = max(1, len(files) // (max(1, args.workers) * 8))
+            for record in executor.map(validate_file, files, chunksize=chunksize):
+                if "error" in record:
+                    errors += 1
+                elif record["violations"]:
+                    with_violations += 1
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Validated {len(files)} files: {with_violations} with violations, {errors} errors",
+          file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())